@@ -0,0 +1,870 @@
+"""
+Benchmarks for the NBA Player Analyzer.
+Most benchmarks build a synthetic pool of players and time the new code path
+against the way it used to be done, for a few pool sizes. The pipeline benchmark
+times every stage of the program on generated CSVs shaped like the starter sheet.
+Benchmarks with a budget make the script exit with status 1 when they miss it.
+
+Run with:  python benchmarks.py            (every benchmark)
+           python benchmarks.py import_time (just the ones named)
+           python benchmarks.py pipeline --sizes 1000 100000 --json after.json --compare before.json
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from final_project import (GameLog, Player, PlayerColumns, RankingSystem, StatMatrix, StatView, default_data_file,
+                           export_ranking, export_rankings_to_csv, export_scenarios, flatten_player_dicts,
+                           instrumentation, minmax_normalize, normalizers, player_teams, players_to_dataframe,
+                           plot_scatter, preset_scenarios, rank_partitions, read_csv_as_dicts, select_top_players,
+                           webgl_threshold)
+
+
+def make_scored_players(n, seed=0):
+    # function makes n players with random scores (the stats don't matter for ranking)
+    rng = random.Random(seed)
+    players = []
+    for i in range(n):
+        player = Player(f"Player {i}", f"T{i % 30}", "PG", 25, 60, 30.0, {})
+        # rounding creates plenty of ties so the tie breaking is exercised too
+        player.score = round(rng.random(), 3)
+        players.append(player)
+    return players
+
+
+def best_time(func, repeat=5):
+    # function runs func a few times and returns the fastest time in milliseconds
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+
+def bench_rank_player(sizes=(1_000, 10_000, 100_000, 1_000_000), top_n=10):
+    """
+    This benchmark compares the old rank_player (sort the whole pool and slice it)
+    with the partial top_n selection that rank_player uses now
+    """
+    print(f"\nrank_player top {top_n}")
+    print(f"{'players':>10} {'full sort (ms)':>15} {'partial (ms)':>13} {'speedup':>8}")
+    for n in sizes:
+        players = make_scored_players(n)
+        full_sort = best_time(lambda: sorted(players, key=lambda p: p.score, reverse=True)[:top_n])
+        partial = best_time(lambda: select_top_players(players, top_n))
+        print(f"{n:>10} {full_sort:>15.2f} {partial:>13.2f} {full_sort / partial:>7.1f}x")
+
+
+# importing final_project should stay cheap (no CSV loading, no plotly/pandas)
+import_time_budget_ms = 250
+
+
+def import_time_ms(module="final_project"):
+    # function imports the module in a fresh python with -X importtime and returns the cumulative time
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+    )
+    for line in result.stderr.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"{module} not found in -X importtime output")
+
+
+def bench_import_time(repeat=5):
+    """
+    This benchmark times importing final_project the same way python -X importtime does.
+    It returns False when the best time is over import_time_budget_ms, so an import-time
+    side effect (like loading the CSV or importing plotly at the top) shows up right away
+    """
+    best = min(import_time_ms() for _ in range(repeat))
+    heavy = [name for name in ("pandas", "plotly") if _imported_by_final_project(name)]
+    print(f"\nimport final_project: {best:.1f} ms (budget {import_time_budget_ms} ms)")
+    if heavy:
+        print("  imported at import time:", ", ".join(heavy))
+    return best <= import_time_budget_ms and not heavy
+
+
+def _imported_by_final_project(module):
+    # function checks if importing final_project also imported module
+    code = f"import sys, final_project; print({module!r} in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+    return result.stdout.strip() == "True"
+
+
+# the stat columns of the starter CSV, used for the synthetic players
+starter_stat_names = ["GS", "FG", "FGA", "FG%", "3P", "3PA", "3P%", "2P", "2PA", "2P%", "eFG%", "FT", "FTA",
+                      "FT%", "ORB", "DRB", "TRB", "AST", "STL", "BLK", "TOV", "PF", "PTS"]
+
+
+class DictPlayer:
+    # the Player layout from before __slots__: an instance __dict__, its own stats and
+    # norm_stats dictionaries and an id string stored on every player
+    def __init__(self, name, team, position, age, games_played, min_played, stats):
+        self.name = name
+        self.team = team
+        self.position = position
+        self.age = age
+        self.games_played = games_played
+        self.min_played = min_played
+        self.stats = stats
+        self.norm_stats = {}
+        self.score = 0.0
+        self.id = f"{name}_{team}"
+
+
+def traced_mb(build):
+    # function returns how many MB are still allocated by what build() returns
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current / 1e6
+
+
+def traced_peak_mb(func):
+    # function returns the peak MB allocated while func() runs
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def build_dict_players(n):
+    rng = np.random.default_rng(0)
+    players = []
+    for i in range(n):
+        values = rng.random(len(starter_stat_names)).tolist()
+        player = DictPlayer(f"Player {i}", "BOS", "PG", 25, 60, 30.0, dict(zip(starter_stat_names, values)))
+        player.norm_stats = dict(zip(starter_stat_names, values))
+        players.append(player)
+    return players
+
+
+def build_slot_players(n):
+    rng = np.random.default_rng(0)
+    matrix = StatMatrix.from_array(starter_stat_names, rng.random((n, len(starter_stat_names))))
+    matrix.norm[:] = matrix.values
+    players = [Player(f"Player {i}", "BOS", "PG", 25, 60, 30.0, StatView(matrix, i)) for i in range(n)]
+    return players, matrix
+
+
+def bench_player_memory(sizes=(10_000, 100_000, 1_000_000)):
+    """
+    This benchmark uses tracemalloc to compare the memory of the old dictionary based
+    Player layout with the __slots__ players that view rows of a shared StatMatrix.
+    Both layouts hold the raw and normalized value of every stat
+    """
+    print(f"\nPlayer memory ({len(starter_stat_names)} stats, raw + normalized)")
+    print(f"{'players':>10} {'dicts (MB)':>11} {'slots (MB)':>11} {'saving':>7}")
+    for n in sizes:
+        old = traced_mb(lambda: build_dict_players(n))
+        new = traced_mb(lambda: build_slot_players(n))
+        print(f"{n:>10} {old:>11.1f} {new:>11.1f} {old / new:>6.1f}x")
+
+
+def make_player_columns(n, seed=0):
+    # function makes PlayerColumns of n synthetic players with the starter CSV's stats
+    rng = np.random.default_rng(seed)
+    return PlayerColumns(
+        [f"Player {i}" for i in range(n)], [f"T{i % 30}" for i in range(n)], ["PG"] * n, np.full(n, 25),
+        np.full(n, 60), np.full(n, 30.0), list(starter_stat_names), rng.random((n, len(starter_stat_names)))
+    )
+
+
+def make_ranking_system(n, seed=0):
+    # function makes a RankingSystem of n synthetic players with the starter CSV's stats
+    ranking_system = RankingSystem(cache_size=8)
+    ranking_system.add_columns(make_player_columns(n, seed))
+    return ranking_system
+
+
+def bench_concurrent_ranking(n=20_000, threads=8, rounds=200, scenario_count=24, top_n=10):
+    """
+    This benchmark ranks random scenarios from several threads at once on one shared
+    RankingSystem (with a cache smaller than the number of scenarios, so entries keep getting
+    evicted and rescored) and checks every ranking against the one worked out on its own first,
+    and that ranking didn't write scores onto the players. It returns False if any threaded
+    ranking came out different, so it can be run on its own as a correctness check
+    """
+    rng = random.Random(0)
+    scenarios = [{stat: rng.uniform(-1, 1) for stat in rng.sample(starter_stat_names, 5)}
+                 for _ in range(scenario_count)]
+    sequential = make_ranking_system(n)
+    expected = [[(p.id, score) for p, score in sequential.rank(weights, top_n)] for weights in scenarios]
+
+    ranking_system = make_ranking_system(n)
+    ranking_system.rank_by_situation(scenarios[0], top_n)
+    player_scores = [p.score for p in ranking_system.players]
+
+    def worker(seed):
+        worker_rng = random.Random(seed)
+        mismatches = 0
+        for _ in range(rounds):
+            i = worker_rng.randrange(scenario_count)
+            if worker_rng.random() < 0.5:
+                ranked = ranking_system.rank(scenarios[i], top_n)
+            else:
+                ranked = ranking_system.rank_many({"s": scenarios[i]}, top_n)["s"]
+            if [(p.id, score) for p, score in ranked] != expected[i]:
+                mismatches += 1
+        return mismatches
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        mismatches = sum(pool.map(worker, range(threads)))
+    elapsed = time.perf_counter() - start
+    # rank and rank_many return results, the scores rank_by_situation put on the players stay
+    changed_scores = sum(p.score != score for p, score in zip(ranking_system.players, player_scores))
+    stats = ranking_system.cache_stats()
+    print(f"\nconcurrent ranking: {threads} threads x {rounds} rankings of {n} players in {elapsed:.2f} s")
+    print(f"  cache hits {stats['hits']}, misses {stats['misses']}, evictions {stats['evictions']}, "
+          f"mismatches {mismatches}, player scores changed {changed_scores}")
+    return mismatches == 0 and changed_scores == 0
+
+
+def check_incremental_normalization(n=2_000, rounds=300, seed=0):
+    """
+    This function makes random changes to a pool (new players, changed stats, NaN and text
+    values, new minimums and maximums, a player at the min or max moved to the middle, new
+    stat columns) and after each round checks the incrementally updated normalization against
+    calculate_min_max(force=True) and minmax_normalize. It returns the number of mismatches
+    """
+    rng = random.Random(seed)
+    ranking_system = make_ranking_system(n, seed)
+    ranking_system.calculate_min_max()
+    stat_names = list(starter_stat_names)
+    mismatches = 0
+    for round_number in range(rounds):
+        for _ in range(rng.choice((1, 3, 20, 200))):
+            kind = rng.random()
+            player = rng.choice(ranking_system.players)
+            stat = rng.choice(stat_names)
+            if kind < 0.15:
+                stats = {name: rng.random() for name in stat_names if rng.random() > 0.1}
+                ranking_system.add_player(Player(f"New {round_number}", "NEW", "C", 30, 60, 30.0, stats))
+            elif kind < 0.25:
+                player.set_stat(stat, rng.choice((np.nan, "n/a", "")))
+            elif kind < 0.35:
+                # a new min or max for the stat
+                player.set_stat(stat, rng.choice((-1.0, 2.0)) * rng.uniform(1, 3))
+            elif kind < 0.5:
+                # the player holding the min or max moves to the middle, so the bound has to be found again
+                column = ranking_system.matrix.column(stat)
+                if not np.isnan(column).all():
+                    row = int(rng.choice((np.nanargmin(column), np.nanargmax(column))))
+                    ranking_system.players[row].set_stat(stat, 0.5)
+            elif kind < 0.51:
+                stat_names.append(f"EXTRA{len(stat_names)}")
+                player.set_stat(stat_names[-1], rng.random())
+            else:
+                player.set_stat(stat, rng.random())
+        ranking_system.calculate_min_max()
+        matrix = ranking_system.matrix
+        incremental = matrix.norm[:matrix.size].copy()
+        bounds = (dict(ranking_system.norm_min), dict(ranking_system.norm_max))
+        expected = minmax_normalize(matrix.values[:matrix.size])
+        ranking_system.calculate_min_max(force=True)
+        if (not np.allclose(incremental, expected) or not np.allclose(incremental, matrix.norm[:matrix.size])
+                or not all(np.allclose(list(old.values()), list(new.values()), equal_nan=True)
+                           for old, new in zip(bounds, (ranking_system.norm_min, ranking_system.norm_max)))):
+            mismatches += 1
+    return mismatches
+
+
+def bench_incremental_normalization(n=200_000, changes=(10, 100, 1_000, 10_000)):
+    """
+    This benchmark checks the incremental normalization against a full recompute on randomly
+    changed pools (returning False on any mismatch), then times a full recompute against the
+    incremental update after a number of changed stats on a big pool
+    """
+    mismatches = sum(check_incremental_normalization(seed=seed) for seed in range(3))
+    print(f"\nincremental normalization: 3 x 300 random rounds checked, mismatches {mismatches}")
+    ranking_system = make_ranking_system(n)
+    ranking_system.calculate_min_max()
+    matrix = ranking_system.matrix
+    rng = np.random.default_rng(0)
+    print(f"  full recompute of {n} players {best_time(lambda: ranking_system.calculate_min_max(force=True)):>8.1f} ms")
+    for count in changes:
+        def change_and_update():
+            for row, col in zip(rng.integers(0, n, count).tolist(), rng.integers(0, len(starter_stat_names), count).tolist()):
+                matrix.set_value(row, starter_stat_names[col], rng.random())
+            start = time.perf_counter()
+            ranking_system.calculate_min_max()
+            return (time.perf_counter() - start) * 1000
+        elapsed = min(change_and_update() for _ in range(3))
+        print(f"  {count:>6} changed stats       {elapsed:>8.1f} ms")
+    return mismatches == 0
+
+
+def bench_partitions(partitions=8, rows=250_000, top_n=10):
+    """
+    This benchmark ranks several synthetic partitions (like seasons) for every preset scenario
+    with rank_partitions, in one process (max_workers=1) and with more worker processes, and
+    prints the speedup over one worker. With one partition per core it should get close to
+    the number of cores. It returns False if any worker count gave a different ranking
+    """
+    parts = {f"season {i}": make_player_columns(rows, seed=i) for i in range(partitions)}
+    cores = os.cpu_count() or 1
+    print(f"\nrank_partitions: {partitions} partitions of {rows} players, {len(preset_scenarios)} scenarios, {cores} cores")
+    expected = None
+    same = True
+    base = None
+    for workers in sorted({1, min(2, cores), min(4, cores), cores}):
+        results = []
+        elapsed = best_time(lambda: results.append(rank_partitions(parts, top_n=top_n, max_workers=workers)), repeat=3)
+        base = base or elapsed
+        expected = expected or results[0]
+        same = same and all(result == expected for result in results)
+        print(f"  {workers:>3} workers {elapsed:>8.0f} ms   speedup {base / elapsed:>5.2f}x")
+    if not same:
+        print("  the rankings differ between worker counts")
+    return same
+
+
+def bench_weight_sweep(sizes=(1_000, 100_000), samples=10_000, top_n=10, baseline_samples=20, budget_mb=64):
+    """
+    This benchmark times a weight sweep of samples vectors against re-ranking each vector
+    with rank_by_situation (timed for baseline_samples vectors with a fresh cache and scaled up).
+    It also measures the peak memory of sweeps of 2,000 players with memory_budget_mb=budget_mb
+    and returns False if one of them went over the budget
+    """
+    base = {stat: 1.0 / 5 for stat in ("PTS", "AST", "TRB", "STL", "BLK")}
+    ranges = {stat: 0.1 for stat in base}
+    print(f"\nweight sweep of {samples} vectors, top {top_n}")
+    print(f"{'players':>10} {'one by one (s)':>15} {'sweep (s)':>10} {'speedup':>8} {'mean tau':>9}")
+    for n in sizes:
+        ranking_system = make_ranking_system(n)
+        start = time.perf_counter()
+        result = ranking_system.sweep_weights(base, ranges, samples, top_n, seed=0)
+        sweep = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(baseline_samples):
+            ranking_system.rank_by_situation(result.weights(i), top_n)
+        one_by_one = (time.perf_counter() - start) * samples / baseline_samples
+        print(f"{n:>10} {one_by_one:>15.2f} {sweep:>10.2f} {one_by_one / sweep:>7.1f}x "
+              f"{result.summary()['mean_tau']:>9.3f}")
+
+    ranking_system = make_ranking_system(2_000)
+    ranking_system.score(base)
+    within = True
+    print(f"peak memory of a sweep of 2000 players and 5000 vectors (budget {budget_mb} MB)")
+    for budget_top_n in (10, 100):
+        tracemalloc.start()
+        ranking_system.sweep_weights(base, ranges, 5_000, budget_top_n, seed=0, memory_budget_mb=budget_mb)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        within = within and peak <= budget_mb * 1e6
+        print(f"  top {budget_top_n:>3}: {peak / 1e6:>6.1f} MB")
+    return within
+
+
+def bench_normalizers(n=1_000_000, missing=0.01):
+    """
+    This benchmark times every normalizer on n players with the starter CSV's stats (with a
+    few missing values), and how long switching back to a normalizer takes once it's cached
+    """
+    rng = np.random.default_rng(0)
+    values = rng.gamma(2.0, 5.0, (n, len(starter_stat_names)))
+    values[rng.random(values.shape) < missing] = np.nan
+    print(f"\nnormalizers on {n} players x {len(starter_stat_names)} stats")
+    print(f"{'normalizer':>11} {'first (ms)':>11} {'cached (ms)':>12}")
+    ranking_system = RankingSystem()
+    ranking_system.matrix = StatMatrix.from_array(starter_stat_names, values)
+    for name in normalizers:
+        ranking_system.normalizer = name
+        first = best_time(lambda: ranking_system.calculate_min_max(force=True), repeat=1)
+        ranking_system.normalizer = "zscore" if name != "zscore" else "minmax"
+        ranking_system.calculate_min_max()
+        cached = best_time(lambda: setattr(ranking_system, "normalizer", name), repeat=1)
+        print(f"{name:>11} {first:>11.1f} {cached:>12.1f}")
+
+
+def bench_export(n=100_000, top_n=20):
+    """
+    This benchmark compares the old menu export (rank_by_situation for the top_n and again for
+    the full pool, then csv.writer row by row with a p.stats lookup per cell) with the bulk export
+    from one ranking, then times exporting every preset scenario with one and with four writers
+    """
+    ranking_system = make_ranking_system(n)
+    # stats with one decimal like the CSV, long random floats would make it all about float formatting
+    ranking_system.matrix.values[:n] = np.round(ranking_system.matrix.values[:n] * 30, 1)
+    weights = preset_scenarios["overall"]
+    print(f"\nexport of {n} players (top {top_n} file + full file)")
+    with tempfile.TemporaryDirectory() as directory:
+        prefix = os.path.join(directory, "bench_")
+
+        def old_export():
+            export_rankings_to_csv(ranking_system.rank_by_situation(weights, top_n), prefix + "old_top.csv")
+            export_rankings_to_csv(ranking_system.rank_by_situation(weights, len(ranking_system.players)),
+                                   prefix + "old_full.csv")
+
+        def new_export(fmt):
+            ranking_system.scenario_cache.clear()
+            result = ranking_system.score(weights)
+            export_ranking(ranking_system, result, prefix + "new_top." + fmt, fmt, top_n)
+            export_ranking(ranking_system, result, prefix + "new_full." + fmt, fmt)
+
+        # the old export prints its own messages, they're kept out of the table
+        stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+        try:
+            old = best_time(old_export, repeat=1)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        print(f"  old csv       {old:>9.0f} ms")
+        for fmt in ("csv", "ndjson"):
+            print(f"  bulk {fmt:<8} {best_time(lambda: new_export(fmt), repeat=1):>9.0f} ms")
+        for workers in (1, 4):
+            ranking_system.scenario_cache.clear()
+            elapsed = best_time(lambda: export_scenarios(ranking_system, preset_scenarios, prefix, ("csv",), top_n,
+                                                         max_workers=workers), repeat=1)
+            print(f"  {len(preset_scenarios)} scenarios, {workers} writer(s): {elapsed:>6.0f} ms")
+
+
+def bench_flat_export(sizes=(10_000, 100_000)):
+    """
+    This benchmark compares the peak memory and time of making the flat player DataFrame the
+    old way (to_dict_list, then flatten_player_dicts, then pandas) with to_dataframe, and of
+    streaming the flat rows with iter_flat_dicts without keeping them
+    """
+    import pandas as pd
+    print(f"\nflat player table ({len(starter_stat_names)} stats, raw + normalized)")
+    print(f"{'players':>10} {'old peak (MB)':>14} {'new peak (MB)':>14} {'stream (MB)':>12} {'old (ms)':>9} {'new (ms)':>9}")
+    for n in sizes:
+        ranking_system = make_ranking_system(n)
+        ranking_system.calculate_min_max()
+        old = lambda: pd.DataFrame(flatten_player_dicts(ranking_system.to_dict_list()))
+        new = lambda: ranking_system.to_dataframe()
+        stream = lambda: sum(1 for _ in ranking_system.iter_flat_dicts())
+        print(f"{n:>10} {traced_peak_mb(old):>14.1f} {traced_peak_mb(new):>14.1f} {traced_peak_mb(stream):>12.1f} "
+              f"{best_time(old, repeat=1):>9.0f} {best_time(new, repeat=1):>9.0f}")
+
+
+def bench_similarity(sizes=(10_000, 100_000), k=10):
+    """
+    This benchmark times a similar_players query and the full all pairs similarity table,
+    and compares the table's peak memory with what a players x players score matrix would take
+    """
+    print(f"\nsimilar players (cosine, k={k})")
+    print(f"{'players':>10} {'query (ms)':>11} {'table (s)':>10} {'peak (MB)':>10} {'n x n (MB)':>11}")
+    for n in sizes:
+        ranking_system = make_ranking_system(n)
+        index = ranking_system.similarity_index()
+        query = best_time(lambda: ranking_system.similar_players(ranking_system.players[0], k))
+        start = time.perf_counter()
+        peak = traced_peak_mb(lambda: index.table(k))
+        table = time.perf_counter() - start
+        print(f"{n:>10} {query:>11.2f} {table:>10.1f} {peak:>10.0f} {n * n * 8 / 1e6:>11.0f}")
+
+
+def make_varied_ranking_system(n, seed=0, traded=0.0):
+    # function makes a normalized RankingSystem of n players with random teams, positions, ages,
+    # games, minutes and stats, a traded share of them playing for two teams ("T3 / T17")
+    rng = np.random.default_rng(seed)
+    teams = [f"T{i % 30}" for i in range(n)]
+    for i in np.flatnonzero(rng.random(n) < traded).tolist():
+        teams[i] = f"T{i % 30} / T{(i + 7) % 30}"
+    columns = PlayerColumns(
+        [f"Player {i}" for i in range(n)], teams,
+        rng.choice(["PG", "SG", "SF", "PF", "C"], n).tolist(), rng.integers(19, 40, n),
+        rng.integers(20, 83, n), np.round(rng.uniform(15, 40, n), 1), list(starter_stat_names),
+        rng.random((n, len(starter_stat_names)))
+    )
+    ranking_system = RankingSystem()
+    ranking_system.add_columns(columns)
+    ranking_system.calculate_min_max()
+    return ranking_system
+
+
+def bench_filtered_ranking(n=1_000_000, top_n=10):
+    """
+    This benchmark ranks "guards under 25" and one team through the secondary indexes (pool and
+    subset normalization, first call and cached) and compares it with the old way of building
+    a second RankingSystem out of the filtered players
+    """
+    ranking_system = make_varied_ranking_system(n)
+    weights = preset_scenarios["overall"]
+    print(f"\nfiltered ranking of {n} players, top {top_n}")
+    start = time.perf_counter()
+    ranking_system.filter_rows({"team": "T0"})
+    print(f"  building the indexes          {(time.perf_counter() - start) * 1000:>8.0f} ms")
+    for label, filters in (("guards under 25", {"position": ["PG", "SG"], "age": (None, 24)}),
+                           ("one team", {"team": "T7"})):
+        def rebuild():
+            players = [p for p in ranking_system.players
+                       if p.position in filters.get("position", [p.position]) and p.age <= filters.get("age", (0, 99))[1]
+                       and p.team == filters.get("team", p.team)]
+            subset = RankingSystem()
+            subset.add_player([Player(p.name, p.team, p.position, p.age, p.games_played, p.min_played, dict(p.stats))
+                               for p in players])
+            return subset.rank(weights, top_n)
+        print(f"  {label}:")
+        print(f"    new RankingSystem           {best_time(rebuild, repeat=1):>8.0f} ms")
+        for normalize in ("pool", "subset"):
+            ranking_system.scenario_cache.clear()
+            ranking_system.subset_cache.clear()
+            first = best_time(lambda: ranking_system.rank(weights, top_n, filters, normalize), repeat=1)
+            cached = best_time(lambda: ranking_system.rank(weights, top_n, filters, normalize))
+            print(f"    {normalize:<6} normalization        {first:>8.0f} ms   cached {cached:.2f} ms")
+
+
+def bench_group_ranking(sizes=(10_000, 1_000_000), top_n=5):
+    """
+    This benchmark builds per team and per position leaderboards with rank_groups (first call
+    and with the groups already built) and compares it with looping over the players to split
+    them into groups and ranking each group. 2% of the players were traded between two teams
+    """
+    weights = preset_scenarios["overall"]
+    for n in sizes:
+        ranking_system = make_varied_ranking_system(n, traded=0.02)
+        ranking_system.score(weights)
+        print(f"\ngroup ranking of {n} players, top {top_n} per group")
+        start = time.perf_counter()
+        ranking_system.filter_rows({"team": "T0"})
+        print(f"  building the indexes {(time.perf_counter() - start) * 1000:>8.0f} ms")
+        for by in ("team", "position"):
+            def loop():
+                result = ranking_system.score(weights)
+                groups = {}
+                for player, score in zip(ranking_system.players, result.scores.tolist()):
+                    for group in (player_teams(player.team) if by == "team" else [getattr(player, by)]):
+                        groups.setdefault(group, []).append((player, score))
+                return {group: sorted(members, key=lambda pair: (-pair[1], pair[0].id))[:top_n]
+                        for group, members in groups.items()}
+            first = best_time(lambda: ranking_system.rank_groups(weights, by, top_n), repeat=1)
+            again = best_time(lambda: ranking_system.rank_groups(weights, by, top_n))
+            print(f"  by {by:<9} loop {best_time(loop, repeat=1):>8.0f} ms   rank_groups {first:>7.0f} ms"
+                  f"   groups built {again:>6.1f} ms")
+
+
+def bench_plots(sizes=(10_000, 100_000, 1_000_000), top_n=20):
+    """
+    This benchmark makes the PTS vs AST scatter plot of the whole pool as standalone HTML (no
+    browser) with every point (WebGL above webgl_threshold) and with hist and hexbin density,
+    and reports the time, the HTML size and the size of the plot's own data (the figure JSON,
+    the rest of the HTML is the plotly.js library). The old way, a full flat DataFrame and
+    px.scatter, is timed for comparison
+    """
+    import plotly.express as px
+    os.makedirs(bench_data_dir, exist_ok=True)
+    path = os.path.join(bench_data_dir, "plot.html")
+    for n in sizes:
+        ranking_system = make_varied_ranking_system(n)
+        ranking_system.apply_result(ranking_system.score(preset_scenarios["overall"]))
+        players = ranking_system.players
+        print(f"\nscatter plot of {n} players")
+        print(f"  old full DataFrame + px.scatter {best_time(lambda: px.scatter(players_to_dataframe(players), x='PTS', y='AST', hover_name='Player'), repeat=1):>8.0f} ms to build")
+        for density in (None, "hist", "hexbin"):
+            figures = []
+            elapsed = best_time(lambda: figures.append(plot_scatter(players, "PTS", "AST", density, top_n, output=path)),
+                                repeat=1)
+            label = density or ("points (WebGL)" if n > webgl_threshold else "points (SVG)")
+            print(f"  {label:<31} {elapsed:>8.0f} ms   html {os.path.getsize(path) / 1e6:>6.1f} MB"
+                  f"   plot data {len(figures[0].to_json()) / 1e6:>7.2f} MB")
+
+
+def bench_instrumentation(n=1_000, calls=20_000):
+    """
+    This benchmark measures what the instrumentation costs per call of a cheap stage
+    (calculate_min_max when nothing changed, which returns right away): the plain function,
+    the instrumented one while instrumentation is off, and while it's on
+    """
+    ranking_system = make_ranking_system(n)
+    ranking_system.calculate_min_max()
+    plain = RankingSystem.calculate_min_max.__wrapped__
+
+    def per_call_us(func):
+        return best_time(lambda: [func(ranking_system) for _ in range(calls)]) * 1000 / calls
+
+    was_enabled = instrumentation.enabled
+    instrumentation.disable()
+    base = per_call_us(plain)
+    off = per_call_us(RankingSystem.calculate_min_max)
+    instrumentation.enable()
+    on = per_call_us(RankingSystem.calculate_min_max)
+    instrumentation.reset()
+    if not was_enabled:
+        instrumentation.disable()
+    print(f"\ninstrumentation cost per stage call: plain {base:.2f} us, off +{off - base:.2f} us, on +{on - base:.2f} us")
+    return {"plain_us": base, "off_us": off, "on_us": on}
+
+
+# generated CSVs are kept here and reused by later runs
+bench_data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_data")
+
+
+def generate_player_csv(path, rows, seed=0, source=default_data_file, chunk_size=50_000):
+    """
+    This function writes a synthetic player CSV with the starter sheet's columns. Every cell is
+    drawn from the same column of the source sheet, so the value ranges, number formats and
+    blank cells look like the real data (the columns are drawn independently of each other).
+    Names get the row number added so every player is different
+    """
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), source), newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        headers = next(reader)
+        source_columns = [np.array(column, dtype=object) for column in zip(*reader)]
+    rng = np.random.default_rng(seed)
+    name_col = headers.index("Player")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        for start in range(0, rows, chunk_size):
+            count = min(chunk_size, rows - start)
+            columns = [column[rng.integers(0, len(column), count)] for column in source_columns]
+            columns[name_col] = [f"{name} {start + i}" for i, name in enumerate(columns[name_col])]
+            writer.writerows(zip(*columns))
+    return path
+
+
+def synthetic_csv(rows, seed=0):
+    # function returns the path of a generated CSV with this many rows, making it the first time
+    os.makedirs(bench_data_dir, exist_ok=True)
+    path = os.path.join(bench_data_dir, f"players_{rows}_{seed}.csv")
+    if not os.path.exists(path):
+        generate_player_csv(path, rows, seed)
+    return path
+
+
+game_log_headers = ["Player", "Team", "Pos", "Age", "Date", "GS", "MP", "FG", "FGA", "3P", "3PA", "FT", "FTA", "ORB",
+                    "DRB", "TRB", "AST", "STL", "BLK", "TOV", "PF", "PTS"]
+
+
+def simulate_game_nights(nights=165, seed=0, source=default_data_file):
+    """
+    This function yields a season of synthetic game logs one night at a time, as lists of row
+    dictionaries with string values like a CSV reader gives. Every player of the source sheet
+    plays for their (first) team, about 12 games are played a night, and each player's box
+    score is drawn around their season averages (shots made from their shooting percentages)
+    """
+    players = read_csv_as_dicts(os.path.join(os.path.dirname(os.path.abspath(__file__)), source))
+    rosters = {}
+    for player in players:
+        rosters.setdefault(player.team.split("/")[0].strip(), []).append(player)
+    teams = sorted(rosters)
+    rng = np.random.default_rng(seed)
+    stat = lambda player, name: max(0.0, np.nan_to_num(player.stats.get(name, 0.0)))
+    for night in range(nights):
+        date = f"day {night + 1}"
+        rows = []
+        for team in rng.permutation(teams)[:24].tolist():
+            for player in rosters[team]:
+                if rng.random() > 0.85:
+                    continue
+                fga = rng.poisson(stat(player, "FGA"))
+                three_pa = rng.binomial(fga, min(1.0, stat(player, "3PA") / max(stat(player, "FGA"), 1e-9)))
+                three = rng.binomial(three_pa, min(1.0, stat(player, "3P%")))
+                two = rng.binomial(fga - three_pa, min(1.0, stat(player, "2P%")))
+                fta = rng.poisson(stat(player, "FTA"))
+                ft = rng.binomial(fta, min(1.0, stat(player, "FT%")))
+                orb, drb = rng.poisson(stat(player, "ORB")), rng.poisson(stat(player, "DRB"))
+                minutes = min(48.0, max(1.0, rng.normal(player.min_played, 4)))
+                rows.append({
+                    "Player": player.name, "Team": team, "Pos": player.position, "Age": str(player.age),
+                    "Date": date, "GS": str(int(stat(player, "GS") > player.games_played / 2)),
+                    "MP": f"{int(minutes)}:{int(minutes % 1 * 60):02d}", "FG": str(two + three), "FGA": str(fga),
+                    "3P": str(three), "3PA": str(three_pa), "FT": str(ft), "FTA": str(fta), "ORB": str(orb),
+                    "DRB": str(drb), "TRB": str(orb + drb),
+                    **{name: str(rng.poisson(stat(player, name))) for name in ("AST", "STL", "BLK", "TOV", "PF")},
+                    "PTS": str(2 * two + 3 * three + ft)
+                })
+        yield rows
+
+
+game_log_budget_ms = 100
+
+
+def bench_game_log(nights=165, top_n=10):
+    """
+    This benchmark plays a synthetic season into a GameLog one night at a time and times each
+    night's update plus a fresh preset ranking in every window, which is what a live "hot hand"
+    board does. It compares that with rebuilding the windows from the whole season so far, and
+    returns False when the slowest night is over game_log_budget_ms
+    """
+    season = list(simulate_game_nights(nights))
+    log = GameLog()
+    times = []
+    for rows in season:
+        start = time.perf_counter()
+        log.add_games(rows)
+        for window in log.windows:
+            log.rank(preset_scenarios["overall"], window, top_n)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+
+    def rebuild():
+        rebuilt = GameLog()
+        rebuilt.add_games([row for rows in season for row in rows])
+        for window in rebuilt.windows:
+            rebuilt.rank(preset_scenarios["overall"], window, top_n)
+    print(f"\ngame log, {nights} nights of about {sum(map(len, season)) // nights} games, windows {log.windows}")
+    print(f"  per night   p50 {times[len(times) // 2]:.1f} ms   p99 {times[int(len(times) * 0.99)]:.1f} ms"
+          f"   max {times[-1]:.1f} ms (budget {game_log_budget_ms} ms)")
+    print(f"  rebuilding the whole season {best_time(rebuild, repeat=1):.0f} ms")
+    return times[-1] <= game_log_budget_ms
+
+
+def bench_pipeline(sizes=(1_000, 100_000, 1_000_000), repeat=3):
+    """
+    This benchmark times each stage of the program on generated CSVs: reading the CSV, adding
+    the players, normalizing, applying the weights, ranking, ranking every preset scenario,
+    exporting the full ranking and to_dict_list. Pools over 100k players are only timed once.
+    It returns {pool size: {stage: milliseconds}} so the run can be saved and compared
+    """
+    results = {}
+    for n in sizes:
+        path = synthetic_csv(n)
+        times = {}
+        rounds = repeat if n <= 100_000 else 1
+        players = read_csv_as_dicts(path)
+        times["read_csv_as_dicts"] = best_time(lambda: read_csv_as_dicts(path), rounds)
+        ranking_system = RankingSystem(weights=preset_scenarios["overall"])
+
+        def add_players():
+            ranking_system.players = []
+            ranking_system.matrix = StatMatrix()
+            ranking_system.add_player(players)
+        times["add_player"] = best_time(add_players, rounds)
+        times["calculate_min_max"] = best_time(lambda: ranking_system.calculate_min_max(force=True), rounds)
+
+        def apply_weights():
+            ranking_system.scenario_cache.clear()
+            ranking_system.apply_weights()
+        times["apply_weights"] = best_time(apply_weights, rounds)
+        times["rank_player"] = best_time(ranking_system.rank_player, rounds)
+
+        def rank_presets():
+            # a cleared cache so every scenario is really scored
+            ranking_system.scenario_cache.clear()
+            for weights in preset_scenarios.values():
+                ranking_system.rank_by_situation(weights)
+        times["rank_by_situation"] = best_time(rank_presets, rounds)
+        ranked = ranking_system.rank_by_situation(preset_scenarios["overall"], len(ranking_system.players))
+        with tempfile.TemporaryDirectory() as directory:
+            export_path = os.path.join(directory, "export.csv")
+            stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+            try:
+                times["export_rankings_to_csv"] = best_time(lambda: export_rankings_to_csv(ranked, export_path), rounds)
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+        times["to_dict_list"] = best_time(ranking_system.to_dict_list, rounds)
+        results[str(n)] = times
+        del players, ranked, ranking_system
+
+    print("\npipeline stages (ms)")
+    print(f"{'stage':<24}" + "".join(f"{n:>12}" for n in results))
+    for stage in next(iter(results.values()), {}):
+        print(f"{stage:<24}" + "".join(f"{times[stage]:>12.1f}" for times in results.values()))
+    return results
+
+
+def flatten_results(results, prefix=""):
+    # function turns nested benchmark results into {"pipeline/1000/rank_player": ms, ...}
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten_results(value, f"{prefix}{key}/"))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare_results(baseline, current, threshold=0.10, min_ms=1.0):
+    """
+    This function compares two saved runs and prints every measurement that got more than
+    threshold slower (and by more than min_ms, so tiny timings don't flag on noise).
+    It returns the list of regressed measurement names
+    """
+    old = flatten_results(baseline.get("results", {}))
+    new = flatten_results(current.get("results", {}))
+    regressions = []
+    print(f"\ncompared with {baseline.get('created', 'baseline')} (threshold {threshold:.0%})")
+    print(f"{'measurement':<45} {'before':>10} {'after':>10} {'change':>8}")
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        change = (after - before) / before if before else 0.0
+        regressed = change > threshold and after - before > min_ms
+        if regressed:
+            regressions.append(key)
+        print(f"{key:<45} {before:>10.1f} {after:>10.1f} {change:>+7.1%}{'  REGRESSION' if regressed else ''}")
+    missing = sorted(old.keys() - new.keys())
+    if missing:
+        print("not measured this run:", ", ".join(missing))
+    return regressions
+
+
+benchmarks = {
+    "rank_player": bench_rank_player,
+    "import_time": bench_import_time,
+    "player_memory": bench_player_memory,
+    "concurrent_ranking": bench_concurrent_ranking,
+    "incremental_normalization": bench_incremental_normalization,
+    "partitions": bench_partitions,
+    "weight_sweep": bench_weight_sweep,
+    "normalizers": bench_normalizers,
+    "export": bench_export,
+    "flat_export": bench_flat_export,
+    "pipeline": bench_pipeline,
+    "instrumentation": bench_instrumentation,
+    "similarity": bench_similarity,
+    "filtered_ranking": bench_filtered_ranking,
+    "group_ranking": bench_group_ranking,
+    "game_log": bench_game_log,
+    "plots": bench_plots,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the NBA Player Analyzer")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run (default all): {', '.join(benchmarks)}")
+    parser.add_argument("--sizes", type=int, nargs="+", help="pool sizes for the pipeline benchmark")
+    parser.add_argument("--json", help="save the measurements to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown that counts as a regression")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in benchmarks]
+    if unknown:
+        parser.error(f"unknown benchmark {', '.join(unknown)}")
+
+    passed = True
+    results = {}
+    for name in args.names or list(benchmarks):
+        result = benchmarks[name](args.sizes) if name == "pipeline" and args.sizes else benchmarks[name]()
+        # benchmarks that check a budget return False when it's missed, the others can return measurements
+        if result is False:
+            passed = False
+        elif isinstance(result, dict):
+            results[name] = result
+    run = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            if compare_results(json.load(f), run, args.threshold):
+                passed = False
+    sys.exit(0 if passed else 1)
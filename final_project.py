@@ -1,8 +1,250 @@
 
 import csv
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
+import functools
+import hashlib
+import inspect
+import io
+import json
+import logging
+import numbers
+import operator
+import os
+import threading
+import time
+import tracemalloc
+import unicodedata
+from bisect import bisect_left
+from heapq import merge
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+# plotly and pandas are only imported inside the plot functions, so scripts that just
+# need Player/RankingSystem don't pay for loading them
+"""
+Instrumentation records how long each stage of the program takes (parsing, normalizing,
+weighting, ranking, exporting), how many rows it went through and, if asked for, how much
+memory it allocated. It's off by default and then a stage costs one attribute check.
+Turn it on with instrumentation.enable(), read the numbers with instrumentation.stats(),
+and with log=True every stage call is also logged as one JSON line on the
+"final_project.instrumentation" logger. instrumentation.capture(stage) runs the next call
+of that stage under cProfile (or pyinstrument) and keeps the report.
+Times include any stages called inside a stage, and with several threads the allocations
+of one stage can include what other threads allocated at the same time
+"""
+class StageStats:
+    __slots__ = ("calls", "total_ms", "max_ms", "rows", "allocated_kb", "peak_kb")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.allocated_kb = 0.0
+        self.peak_kb = 0.0
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "total_ms": self.total_ms,
+            "mean_ms": self.total_ms / self.calls if self.calls else 0.0,
+            "max_ms": self.max_ms,
+            "rows": self.rows,
+            "allocated_kb": self.allocated_kb,
+            "peak_kb": self.peak_kb
+        }
+
+
+class Instrumentation:
+    def __init__(self):
+        # active is the only thing a stage checks when instrumentation is off
+        self.active = False
+        self.enabled = False
+        self.track_allocations = False
+        self.log = False
+        self.logger = logging.getLogger("final_project.instrumentation")
+        self.stages = {}
+        # stage: (profiler, output path) for the next call to capture, and the reports captured
+        self._captures = {}
+        self.profiles = {}
+        self._started_tracemalloc = False
+        self._lock = threading.Lock()
+
+    def enable(self, track_allocations=False, log=False):
+        # method turns the recording on (tracemalloc is started for track_allocations, which slows things down)
+        self.enabled = True
+        self.track_allocations = track_allocations
+        self.log = log
+        if track_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._update_active()
+
+    def disable(self):
+        self.enabled = False
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        self.track_allocations = False
+        self._update_active()
+
+    def reset(self):
+        # method forgets every recorded stage and profile
+        with self._lock:
+            self.stages = {}
+            self.profiles = {}
+
+    def _update_active(self):
+        self.active = self.enabled or bool(self._captures)
+
+    def capture(self, stage, profiler="cprofile", output=None):
+        """
+        This method arms a one time profile of the next call of stage. profiler is "cprofile" or
+        "pyinstrument" (which has to be installed). The text report ends up in profiles[stage],
+        and output (if given) also gets the raw profile (.prof for cProfile, .html for pyinstrument)
+        """
+        if profiler not in ("cprofile", "pyinstrument"):
+            raise ValueError(f"unknown profiler {profiler!r}, choose cprofile or pyinstrument")
+        with self._lock:
+            self._captures[stage] = (profiler, output)
+            self._update_active()
+
+    def run(self, stage, func, args, kwargs, count_rows):
+        # method runs one instrumented call (only used while active)
+        with self._lock:
+            capture = self._captures.pop(stage, None)
+            self._update_active()
+        tracing = self.enabled and self.track_allocations and tracemalloc.is_tracing()
+        if tracing:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        if capture is None:
+            result = func(*args, **kwargs)
+        else:
+            # a profiled call is still recorded, its time just includes the profiler
+            result = self._profile(stage, capture, func, args, kwargs)
+        elapsed = (time.perf_counter() - start) * 1000
+        if not self.enabled:
+            return result
+        rows = self._count_rows(stage, count_rows, result, args, kwargs)
+        allocated = peak = 0.0
+        if tracing:
+            after, highest = tracemalloc.get_traced_memory()
+            allocated, peak = (after - before) / 1024, (highest - before) / 1024
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats()
+            stats.calls += 1
+            stats.total_ms += elapsed
+            stats.max_ms = max(stats.max_ms, elapsed)
+            stats.rows += rows
+            stats.allocated_kb += allocated
+            stats.peak_kb = max(stats.peak_kb, peak)
+        if self.log:
+            record = {"event": "stage", "stage": stage, "ms": round(elapsed, 3), "rows": rows}
+            if tracing:
+                record.update(allocated_kb=round(allocated, 1), peak_kb=round(peak, 1))
+            self.logger.info(json.dumps(record))
+        return result
+
+    def _count_rows(self, stage, count_rows, result, args, kwargs):
+        # the call has already happened, so a counter that fails is logged and counts 0 rows
+        # instead of turning a call that worked into an error
+        if count_rows is None:
+            return 0
+        try:
+            return int(count_rows(result, args, kwargs))
+        except Exception:
+            self.logger.exception("couldn't count the rows of a %s call, counting 0", stage)
+            return 0
+
+    def _profile(self, stage, capture, func, args, kwargs):
+        profiler_name, output = capture
+        if profiler_name == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                raise ImportError("pyinstrument profiling needs pyinstrument: pip install pyinstrument") from None
+            profiler = Profiler()
+            profiler.start()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                profiler.stop()
+            report = profiler.output_text()
+            if output:
+                with open(output, "w", encoding="utf-8") as f:
+                    f.write(profiler.output_html())
+        else:
+            import cProfile
+            import pstats
+            profiler = cProfile.Profile()
+            result = profiler.runcall(func, *args, **kwargs)
+            if output:
+                profiler.dump_stats(output)
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(25)
+            report = text.getvalue()
+        with self._lock:
+            self.profiles[stage] = report
+        return result
+
+    def stats(self):
+        # method returns {stage: {calls, total_ms, mean_ms, max_ms, rows, allocated_kb, peak_kb}}
+        with self._lock:
+            return {stage: stats.as_dict() for stage, stats in self.stages.items()}
+
+    def report(self):
+        # method returns the recorded stages as a text table, slowest stage first
+        lines = [f"{'stage':<24} {'calls':>6} {'total ms':>10} {'mean ms':>9} {'rows':>10} {'alloc KB':>10}"]
+        for stage, stats in sorted(self.stats().items(), key=lambda item: -item[1]["total_ms"]):
+            lines.append(f"{stage:<24} {stats['calls']:>6} {stats['total_ms']:>10.2f} {stats['mean_ms']:>9.2f} "
+                         f"{stats['rows']:>10} {stats['allocated_kb']:>10.1f}")
+        return "\n".join(lines)
+
+
+instrumentation = Instrumentation()
+
+
+def instrumented(stage, count_rows=None):
+    """
+    This decorator makes a function a stage for the instrumentation. count_rows(result, arguments)
+    says how many rows the call went through, arguments maps every parameter name to its value
+    in the call (defaults included) however it was passed. When instrumentation is off the
+    function is called straight away
+    """
+    def decorate(func):
+        signature = inspect.signature(func)
+
+        def counter(result, args, kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return count_rows(result, bound.arguments)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not instrumentation.active:
+                return func(*args, **kwargs)
+            return instrumentation.run(stage, func, args, kwargs, counter if count_rows is not None else None)
+        return wrapper
+    return decorate
+
+
+def _info_property(field):
+    # a player field the filter indexes are built from. Changing it on a player in a StatMatrix
+    # bumps the matrix's info_version, so the indexes and filtered results are worked out again
+    slot = "_" + field
+
+    def set_field(player, value):
+        setattr(player, slot, value)
+        if player._matrix is not None:
+            player._matrix.info_version += 1
+    return property(operator.attrgetter(slot), set_field)
+
+
 """
 Player class, manages the individual player data
 (info, stats, normal stats, and score)
@@ -11,18 +253,84 @@ calculates the score for each player for each situation based of the weights
 and its normalized data, and finally it adds all the player information into a dictionary 
 """
 class Player: 
+    # __slots__ means no per-player __dict__. The stats aren't kept in a per-player dictionary
+    # either: once a player belongs to a StatMatrix it only stores the matrix and its row number
+    __slots__ = ("_name", "_team", "_position", "_age", "_games_played", "_min_played", "_score",
+                 "_matrix", "_row", "_stats", "_norm_stats")
+    name = _info_property("name")
+    team = _info_property("team")
+    position = _info_property("position")
+    age = _info_property("age")
+    games_played = _info_property("games_played")
+    min_played = _info_property("min_played")
+
     def __init__(self, name: str, team: str, position: str, age: int, games_played: int, min_played: int, stats: dict):
-        # all the attributes needed to create the individual player object 
-        self.name = name 
-        self.team = team 
-        self.position = position
-        self.age = age 
-        self.games_played = games_played
-        self.min_played = min_played
+        # all the attributes needed to create the individual player object (a new player isn't
+        # in a matrix yet, so the fields are set directly instead of through the properties)
+        self._name = name 
+        self._team = team 
+        self._position = position
+        self._age = age 
+        self._games_played = games_played
+        self._min_played = min_played
+        self._matrix = None
+        self._row = None
         self.stats = stats
         self.norm_stats = {}
         self.score = 0.0
-        self.id = f"{name}_{team}"
+
+    @property
+    def score(self):
+        """
+        Player.score is only kept so older code keeps working. The real scores are the
+        ScoreResult objects a RankingSystem returns. For a player in a RankingSystem this reads
+        the score of the scenario that was last applied with rank_by_situation/apply_weights
+        """
+        matrix = self._matrix
+        if matrix is not None and matrix.scores is not None and self._row < len(matrix.scores):
+            return float(matrix.scores[self._row])
+        return self._score
+
+    @score.setter
+    def score(self, score):
+        matrix = self._matrix
+        if matrix is not None and matrix.scores is not None and self._row < len(matrix.scores):
+            matrix.scores[self._row] = score
+        else:
+            self._score = score
+
+    @property
+    def id(self):
+        # the id is built when it's needed instead of storing a string for every player
+        return f"{self.name}_{self.team}"
+
+    @property
+    def stats(self):
+        # a player in a StatMatrix gets a view of its row, otherwise its own dictionary
+        if self._matrix is not None:
+            return StatView(self._matrix, self._row)
+        return self._stats
+
+    @stats.setter
+    def stats(self, stats):
+        # setting a StatView ties the player to that matrix row, setting a dictionary unties it
+        if isinstance(stats, StatView):
+            self._matrix, self._row = stats._matrix, stats._row
+            self._stats = None
+        else:
+            self._matrix = self._row = None
+            self._stats = stats
+
+    @property
+    def norm_stats(self):
+        if self._matrix is not None:
+            return StatView(self._matrix, self._row, normalized=True)
+        return self._norm_stats
+
+    @norm_stats.setter
+    def norm_stats(self, norm_stats):
+        # the normalized view always follows the stats, so only a dictionary needs to be stored
+        self._norm_stats = None if isinstance(norm_stats, StatView) else norm_stats
 
     def get_stat(self, stat_name):
         # method is used to get the value of a specific stat 
@@ -36,7 +344,7 @@ class Player:
         """
         method is used to calculate a score for each player based on the weights in place for each situation.
         This is done by looping through all the stats in the weights and then multiplying the stat weight by the 
-        normalized value of the stat.  
+        normalized value of the stat. 
         """
         total = 0
         for stat in weights:
@@ -62,6 +370,845 @@ class Player:
         (used to check if the read_csv_as_dict function worked properly)
         return f"Player({self.name}, {self.team}, {self.position}, Score: {self.score})"
     """
+"""
+The StatMatrix class is the columnar store that the RankingSystem owns.
+Instead of every player keeping its own dictionary of stats, all the stats live
+in one float matrix (one row per player, one column per stat) with a shared
+stat name index. This lets the min/max and normalization be done a whole
+column at a time instead of looping through every player.
+"""
+class StatMatrix:
+    def __init__(self, stat_names=(), capacity: int = 64):
+        # stat name index shared by every row
+        self.stat_names = list(stat_names)
+        self.stat_index = {name: i for i, name in enumerate(self.stat_names)}
+        # raw stats and normalized stats (rows past size are unused capacity)
+        self.values = np.full((capacity, len(self.stat_names)), np.nan)
+        # the normalized matrix is only allocated once something normalizes or reads it
+        self._norm = None
+        # scores of the last applied scenario, what Player.score reads (None until one is applied)
+        self.scores = None
+        self.size = 0
+        self.has_norm = False
+        # bumped every time a row or a value changes so cached results know when they are stale
+        self.version = 0
+        # bumped when a player in the matrix changes name, team, position, age, games or minutes
+        self.info_version = 0
+        # log of changes since the last normalization, (row, col, old value) for a changed
+        # stat and (row, -1, None) for a new row. None means a full recalculation is needed
+        self.changes = None
+        # True for the cells of players that never had that stat (they hold NaN like a stat that
+        # isn't a number, but a StatView leaves them out). Only made once a player is missing one
+        self._missing = None
+        # called before normalized stats are read through a StatView, a RankingSystem sets it to
+        # its calculate_min_max so a new or changed player's norm_stats are never stale
+        self.refresh_norm = None
+
+    def _grow(self, min_rows):
+        # method doubles the row capacity when the matrix is full
+        capacity = max(min_rows, 2 * self.values.shape[0], 64)
+        values = np.full((capacity, self.values.shape[1]), np.nan)
+        values[:self.size] = self.values[:self.size]
+        self.values = values
+        if self._norm is not None:
+            # the normalized matrix can be narrower when columns were added after it was made
+            norm = np.zeros((capacity, self.values.shape[1]))
+            norm[:self.size, :self._norm.shape[1]] = self._norm[:self.size]
+            self._norm = norm
+
+    @property
+    def norm(self):
+        if self._norm is None or self._norm.shape != self.values.shape:
+            norm = np.zeros(self.values.shape)
+            if self._norm is not None:
+                norm[:self._norm.shape[0], :self._norm.shape[1]] = self._norm
+            self._norm = norm
+        return self._norm
+
+    def _set_missing(self, rows, cols, missing):
+        # method marks cells as missing (or not), the mask grows to the matrix's shape when it's used
+        if self._missing is None and not missing:
+            return
+        if self._missing is None or self._missing.shape != self.values.shape:
+            mask = np.zeros(self.values.shape, dtype=bool)
+            if self._missing is not None:
+                mask[:self._missing.shape[0], :self._missing.shape[1]] = self._missing
+            self._missing = mask
+        self._missing[rows, cols] = missing
+
+    def has_value(self, row, col):
+        # method says if the player in row has the stat in col (cells past the mask were all given)
+        missing = self._missing
+        return missing is None or row >= missing.shape[0] or col >= missing.shape[1] or not missing[row, col]
+
+    @classmethod
+    def from_array(cls, stat_names, values):
+        # method wraps an already filled (players x stats) array without copying it
+        matrix = cls(stat_names, capacity=0)
+        matrix.values = values
+        matrix.size = values.shape[0]
+        matrix.changes = None
+        return matrix
+
+    def add_column(self, name):
+        # method adds a new stat column (players that don't have it get NaN)
+        if name in self.stat_index:
+            return self.stat_index[name]
+        self.stat_index[name] = len(self.stat_names)
+        self.stat_names.append(name)
+        capacity = self.values.shape[0]
+        self.values = np.hstack([self.values, np.full((capacity, 1), np.nan)])
+        if self.size:
+            self._set_missing(slice(0, self.size), self.stat_index[name], True)
+        self.version += 1
+        self.changes = None
+        return self.stat_index[name]
+
+    def append_row(self, stats):
+        # method copies a dictionary of stats into the next free row and returns the row number
+        if isinstance(stats, StatView):
+            # a row from another matrix (like a loaded CSV chunk) is copied as a whole
+            source = stats._matrix
+            return self.append_rows(source.values[stats._row:stats._row + 1], source.stat_names)
+        for key in stats:
+            if key not in self.stat_index:
+                self.add_column(key)
+        if self.size == self.values.shape[0]:
+            self._grow(self.size + 1)
+        row = self.size
+        for key, value in stats.items():
+            self.values[row, self.stat_index[key]] = _to_float(value)
+        if len(stats) < len(self.stat_names):
+            self._set_missing(row, [col for name, col in self.stat_index.items() if name not in stats], True)
+        self.size += 1
+        self.version += 1
+        self._log_change(row, -1, None)
+        return row
+
+    def append_rows(self, values, stat_names):
+        """
+        This method copies a whole block of rows at once (one column per name in stat_names)
+        and returns the row number of the first one. It's used for bulk loading where building
+        a dictionary per player would be too slow
+        """
+        cols = [self.add_column(name) for name in stat_names]
+        count = values.shape[0]
+        if self.size + count > self.values.shape[0]:
+            self._grow(self.size + count)
+        start = self.size
+        block = np.full((count, len(self.stat_names)), np.nan)
+        block[:, cols] = values
+        self.values[start:start + count] = block
+        if len(set(cols)) < len(self.stat_names):
+            absent = sorted(set(range(len(self.stat_names))) - set(cols))
+            self._set_missing(np.arange(start, start + count)[:, None], absent, True)
+        self.size += count
+        self.version += 1
+        for row in range(start, start + count):
+            self._log_change(row, -1, None)
+            if self.changes is None:
+                break
+        return start
+
+    def set_value(self, row, stat_name, value):
+        # method updates one stat of one player (adding the stat column if it is new)
+        col = self.add_column(stat_name)
+        old = self.values[row, col]
+        self.values[row, col] = _to_float(value)
+        self._set_missing(row, col, False)
+        self.version += 1
+        self._log_change(row, col, old)
+
+    def set_rows(self, rows, stat_names, values):
+        """
+        This method updates a (rows x stat_names) block of stats at once. Only the cells whose
+        value actually changed are logged (like set_value), so the normalization can still be
+        updated incrementally. It returns the number of changed cells
+        """
+        cols = [self.add_column(name) for name in stat_names]
+        block = np.ix_(rows, cols)
+        old = self.values[block]
+        values = np.asarray(values, dtype=float)
+        changed = ~((old == values) | (np.isnan(old) & np.isnan(values)))
+        if not changed.any():
+            return 0
+        self.values[block] = values
+        self._set_missing(block[0], block[1], False)
+        self.version += 1
+        changed_rows, changed_cols = np.nonzero(changed)
+        if self.changes is not None and len(self.changes) + len(changed_rows) > max(1024, self.size):
+            # same limit as _log_change, without logging the cells one at a time to get there
+            self.changes = None
+        elif self.changes is not None:
+            for i, j in zip(changed_rows.tolist(), changed_cols.tolist()):
+                self.changes.append((int(rows[i]), cols[j], old[i, j]))
+        return len(changed_rows)
+
+    def _log_change(self, row, col, old):
+        # once the log gets as big as the matrix a full recalculation is cheaper, so it stops recording
+        if self.changes is not None:
+            self.changes.append((row, col, old))
+            if len(self.changes) > max(1024, self.size):
+                self.changes = None
+
+    def column(self, stat_name):
+        # method returns the raw values of one stat for all the players
+        return self.values[:self.size, self.stat_index[stat_name]]
+
+
+def top_n_indices(scores, top_n, tie_key):
+    """
+    This function finds the positions of the top_n highest scores without sorting
+    all of them. np.partition finds the top_n-th best score in linear time, then only the
+    scores at or above it are sorted (highest first, ties broken by tie_key(position)).
+    That makes it O(n + k log k) instead of O(n log n) for the full sort
+    """
+    candidates = top_n_candidates(scores, top_n)
+    ordered = sorted(candidates.tolist(), key=lambda i: (-scores[i], tie_key(i)))
+    return ordered[:top_n]
+
+
+def top_n_candidates(scores, top_n):
+    # function returns the positions of every score that could be in the top_n (ties at the cutoff included)
+    n = len(scores)
+    if top_n is None or top_n >= n:
+        return np.arange(n)
+    if top_n <= 0:
+        return np.arange(0)
+    kth_best = np.partition(scores, n - top_n)[n - top_n]
+    return np.flatnonzero(scores >= kth_best)
+
+
+def select_top_players(players, top_n, with_ranks=False):
+    # function returns the top_n players by score (ties go to the lower Player.id)
+    scores = np.fromiter((p.score for p in players), dtype=float, count=len(players))
+    order = top_n_indices(scores, top_n, lambda i: players[i].id)
+    if with_ranks:
+        return [(rank, players[i], float(scores[i])) for rank, i in enumerate(order, 1)]
+    return [players[i] for i in order]
+
+
+def _same_float(a, b):
+    # two floats are the same if they are equal or both NaN
+    return a == b or (np.isnan(a) and np.isnan(b))
+
+
+def _to_float(value):
+    # stats that aren't numbers can't go into the matrix so they are stored as NaN
+    try:
+        return float(value) if value != "" else 0.0
+    except (TypeError, ValueError):
+        return np.nan
+
+
+"""
+StatView is what Player.stats and Player.norm_stats turn into once the player is
+added to a RankingSystem. It acts like the old dictionary, but reads and writes
+go straight to the player's row in the StatMatrix.
+"""
+class StatView(MutableMapping):
+    __slots__ = ("_matrix", "_row", "_normalized")
+
+    def __init__(self, matrix: StatMatrix, row: int, normalized: bool = False):
+        self._matrix = matrix
+        self._row = row
+        self._normalized = normalized
+
+    def _array(self):
+        return self._matrix.norm if self._normalized else self._matrix.values
+
+    def _refresh(self):
+        # normalized stats are brought up to date first, so a new player's aren't stale zeros
+        if self._normalized and self._matrix.refresh_norm is not None:
+            self._matrix.refresh_norm()
+
+    def __getitem__(self, stat_name):
+        matrix = self._matrix
+        if self._normalized:
+            self._refresh()
+            if not matrix.has_norm:
+                raise KeyError(stat_name)
+        col = matrix.stat_index[stat_name]
+        if matrix._missing is not None and not matrix.has_value(self._row, col):
+            # like the old dictionary, a stat the player never had isn't there
+            raise KeyError(stat_name)
+        return float(self._array()[self._row, col])
+
+    def __setitem__(self, stat_name, value):
+        if self._normalized:
+            raise TypeError("normalized stats are computed by the RankingSystem")
+        self._matrix.set_value(self._row, stat_name, value)
+
+    def __delitem__(self, stat_name):
+        raise TypeError("stats stored in a StatMatrix can't be deleted")
+
+    def _names(self):
+        self._refresh()
+        matrix = self._matrix
+        if self._normalized and not matrix.has_norm:
+            return []
+        if matrix._missing is None:
+            return matrix.stat_names
+        return [name for col, name in enumerate(matrix.stat_names) if matrix.has_value(self._row, col)]
+
+    def __iter__(self):
+        return iter(self._names())
+
+    def __len__(self):
+        return len(self._names())
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+def normalize_name(name):
+    # function lowercases a name and folds accents and punctuation away ("Luka Dončić" -> "luka doncic")
+    folded = unicodedata.normalize("NFKD", name or "")
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    folded = "".join(ch if ch.isalnum() else " " for ch in folded.casefold())
+    return " ".join(folded.split())
+
+
+def name_match_rank(name, query):
+    # function says how well a normalized name matches a normalized query, like PlayerIndex.search
+    # ranks them: 0 exact, 1 starts with it, 2 a word starts with it, 3 contains it, None no match
+    if name == query:
+        return 0
+    if name.startswith(query):
+        return 1
+    if query in name:
+        return 2 if f" {query}" in f" {name}" else 3
+    return None
+
+
+"""
+PlayerIndex is the name index used to look players up. It is built once over a list of
+players: exact names go in a dictionary, all the names are kept sorted for prefix
+lookups with bisect, and every 3 letter piece of a name (trigram) points to the players
+that contain it, so a substring search only has to check the players that have the
+query's rarest trigram instead of every name. Players can also be looked up by Player.id
+"""
+class PlayerIndex:
+    def __init__(self, players=()):
+        self.players = []
+        self._names = []
+        self._by_id = {}
+        self._exact = {}
+        self._sorted = []
+        self._trigrams = {}
+        self.add(players)
+
+    def add(self, players):
+        # method adds more players to the index
+        start = len(self.players)
+        for player in players:
+            pos = len(self.players)
+            name = normalize_name(player.name)
+            self.players.append(player)
+            self._names.append(name)
+            self._by_id.setdefault(player.id, player)
+            self._exact.setdefault(name, []).append(pos)
+            for trigram in {name[i:i + 3] for i in range(len(name) - 2)}:
+                self._trigrams.setdefault(trigram, []).append(pos)
+        # only the new names get sorted, then they are merged into the names already sorted
+        added = sorted(zip(self._names[start:], range(start, len(self._names))))
+        self._sorted = list(merge(self._sorted, added)) if self._sorted else added
+
+    def __len__(self):
+        return len(self.players)
+
+    def by_id(self, player_id):
+        # method returns the player with this id (or None)
+        return self._by_id.get(player_id)
+
+    def _prefix_matches(self, query):
+        # all the names that start with query are next to each other in the sorted list
+        start = bisect_left(self._sorted, (query, -1))
+        matches = []
+        for name, pos in self._sorted[start:]:
+            if not name.startswith(query):
+                break
+            matches.append(pos)
+        return matches
+
+    def _substring_matches(self, query):
+        if len(query) < 3:
+            # too short for a trigram, so these have to be checked one by one
+            return [pos for pos, name in enumerate(self._names) if query in name]
+        # only the players with the query's rarest trigram can match, and checking those
+        # directly is cheaper than intersecting with the long lists of the common trigrams
+        trigrams = {query[i:i + 3] for i in range(len(query) - 2)}
+        rarest = min((self._trigrams.get(trigram, []) for trigram in trigrams), key=len)
+        return [pos for pos in rarest if query in self._names[pos]]
+
+    def search(self, query, limit=None):
+        """
+        This method returns every player whose name matches query, best matches first:
+        exact name, then names that start with the query, then names with a word that starts
+        with it, then names that just contain it. Inside each group players stay in the order
+        they were added, like the old linear search
+        """
+        query = normalize_name(query)
+        if not query:
+            return []
+        ranks = {}
+        for pos in self._exact.get(query, []):
+            ranks[pos] = 0
+        for pos in self._prefix_matches(query):
+            ranks.setdefault(pos, 1)
+        for pos in self._substring_matches(query):
+            if pos not in ranks:
+                ranks[pos] = 2 if f" {query}" in f" {self._names[pos]}" else 3
+        ordered = sorted(ranks, key=lambda pos: (ranks[pos], pos))
+        return [self.players[pos] for pos in ordered[:limit]]
+
+
+def team_code(team):
+    # function normalizes a team the way the index stores it, so " tor" and "TOR" are the same team
+    return team.strip().upper()
+
+
+def player_teams(team):
+    # function splits a traded player's team ("LAL / DAL") into every team they played for
+    return [team_code(part) for part in team.split("/")]
+
+
+# team codes some sheets use for a traded player's season total instead of listing the teams
+combined_team_codes = ("TOT", "2TM", "3TM", "4TM", "5TM")
+
+
+def is_combined_team(team):
+    # function tells whether a team is a traded player's season total ("LAL / DAL" or "TOT")
+    team = team_code(team)
+    return "/" in team or team in combined_team_codes
+
+
+# player fields the attribute index can filter on
+categorical_fields = ("team", "position")
+numeric_fields = ("age", "games_played", "min_played")
+
+
+def _check_filter_value(field, value, range_end=False):
+    # function makes sure a value in a filter can be compared with the field (and hashed in the key)
+    if field in numeric_fields:
+        if range_end and value is None:
+            return value
+        if isinstance(value, bool) or not isinstance(value, numbers.Real):
+            raise ValueError(f"{field} has to be filtered with numbers, not {value!r}")
+    elif not isinstance(value, str):
+        raise ValueError(f"{field} has to be filtered with text values, not {value!r}")
+    elif field == "team":
+        return team_code(value)
+    return value
+
+
+def filter_key(filters):
+    """
+    This function checks a filter dictionary and turns it into a canonical key. filters maps a
+    field to a condition: a single value (equal to), a list or set of values (any of them), or
+    for the numeric fields a (low, high) tuple or {"min": low, "max": high} dictionary (both
+    ends included, None means no limit)
+    """
+    key = []
+    for field, condition in (filters or {}).items():
+        if field not in categorical_fields and field not in numeric_fields:
+            raise ValueError(f"can't filter on {field!r}, choose from {list(categorical_fields + numeric_fields)}")
+        if isinstance(condition, dict):
+            unknown = set(condition) - {"min", "max"}
+            if unknown:
+                raise ValueError(f"a range for {field} only takes min and max, not {', '.join(sorted(unknown))}")
+            condition = (condition.get("min"), condition.get("max"))
+        if isinstance(condition, tuple):
+            if field not in numeric_fields or len(condition) != 2:
+                raise ValueError(f"a range for {field} has to be (low, high) on a numeric field")
+            key.append((field, "range", tuple(_check_filter_value(field, end, range_end=True) for end in condition)))
+        elif isinstance(condition, (list, set, frozenset)):
+            key.append((field, "in", tuple(sorted(_check_filter_value(field, value) for value in condition))))
+        else:
+            key.append((field, "in", (_check_filter_value(field, condition),)))
+    return tuple(sorted(key))
+
+
+"""
+PlayerAttributeIndex holds the secondary indexes a RankingSystem filters with. team and
+position map each value to the sorted rows that have it (a traded player is under every
+team they played for), and age, games_played and min_played are kept as a sorted array
+with the row of each value, so a range is two binary searches. A filter is resolved to a
+boolean mask over the pool, one field at a time. The index also keeps the grouping of the
+pool by each field that RankingSystem.rank_groups sorts through
+"""
+class PlayerAttributeIndex:
+    def __init__(self, players=()):
+        self.names = []
+        self.values = {field: [] for field in categorical_fields + numeric_fields}
+        self.add(players)
+
+    def add(self, players):
+        # method adds more players, the indexes are rebuilt the next time they're used
+        for player in players:
+            self.names.append(player.name)
+            for field in self.values:
+                self.values[field].append(getattr(player, field))
+        self._postings = self._sorted = self._stints = self._stint_rows = self._id_rank = None
+        self._groups = {}
+
+    def __len__(self):
+        return len(self.values["age"])
+
+    def _build(self):
+        postings = {}
+        for field in categorical_fields:
+            rows_by_value = {}
+            for row, value in enumerate(self.values[field]):
+                for part in player_teams(value) if field == "team" else (value,):
+                    rows_by_value.setdefault(part, []).append(row)
+            postings[field] = {value: np.array(rows, dtype=np.int64) for value, rows in rows_by_value.items()}
+        sorted_fields = {}
+        for field in numeric_fields:
+            values = np.array(self.values[field], dtype=float)
+            order = np.argsort(values, kind="stable")
+            sorted_fields[field] = (values[order], order)
+        pairs = [(total, row) for total, by_team in self.stints().items() for row in by_team.values()]
+        # (season total row, stint row) of every stint, None when nobody has one
+        self._stint_rows = tuple(np.array(column, dtype=np.int64) for column in zip(*pairs)) if pairs else None
+        self._postings, self._sorted = postings, sorted_fields
+
+    def rows(self, field, kind, condition):
+        # method returns the rows matching one (kind, condition) entry of a filter_key
+        if self._postings is None:
+            self._build()
+        if field in categorical_fields:
+            postings = self._postings[field]
+            found = [postings[value] for value in condition if value in postings]
+            rows = np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+            if field == "team" and self._stint_rows is not None:
+                # a traded player matched by a stint row is kept as that row and their season
+                # total row is left out, the same rule as the team groups
+                totals, stint_rows = self._stint_rows
+                rows = rows[~np.isin(rows, totals[np.isin(stint_rows, rows)])]
+            return rows
+        values, order = self._sorted[field]
+        if kind == "range":
+            low, high = condition
+            start = 0 if low is None else np.searchsorted(values, low, "left")
+            stop = len(values) if high is None else np.searchsorted(values, high, "right")
+            return order[start:stop]
+        return np.concatenate([order[np.searchsorted(values, value, "left"):np.searchsorted(values, value, "right")]
+                               for value in condition] or [np.zeros(0, dtype=np.int64)])
+
+    def mask(self, key):
+        # method returns the boolean mask of the rows that pass every condition of a filter_key
+        mask = np.ones(len(self), dtype=bool)
+        for field, kind, condition in key:
+            field_mask = np.zeros(len(self), dtype=bool)
+            field_mask[self.rows(field, kind, condition)] = True
+            mask &= field_mask
+        return mask
+
+    def column(self, field):
+        # method returns a numeric field as an array in row order
+        if self._sorted is None:
+            self._build()
+        values, order = self._sorted[field]
+        column = np.empty(len(values))
+        column[order] = values
+        return column
+
+    def stints(self):
+        """
+        This method finds the traded players that have a row for each team they played for
+        (a stint) as well as their season total row, like "Kelly Olynyk, NOP / TOR" and
+        "Kelly Olynyk, TOR". Rows are the same player when the name and age match and exactly
+        one of them has a combined team. It returns {total row: {team: stint row}}
+        """
+        if self._stints is None:
+            teams = self.values["team"]
+            # only the names of players with a combined team can have stints, so only they are looked at
+            combined = {team for team in set(teams) if is_combined_team(team)}
+            traded_names = {self.names[row] for row, team in enumerate(teams) if team in combined}
+            rows_by_player = {}
+            for row, name in enumerate(self.names):
+                if name in traded_names:
+                    rows_by_player.setdefault((name, self.values["age"][row]), []).append(row)
+            stints = {}
+            for rows in rows_by_player.values():
+                totals = [row for row in rows if is_combined_team(teams[row])]
+                if len(rows) > 1 and len(totals) == 1:
+                    stints[totals[0]] = {team_code(teams[row]): row for row in rows if row != totals[0]}
+            self._stints = stints
+        return self._stints
+
+    def groups(self, field):
+        """
+        This method groups the pool by a field and returns (group values, group of each entry,
+        row of each entry), with the group values sorted. Every player is one entry, except a
+        traded player grouped by team: they are in the group of every team they played for,
+        with their stint row for that team when there is one and their season total row when
+        there isn't. Stint rows are left out of every other grouping so nobody counts twice.
+        The groups come straight from the posting lists and sorted arrays
+        """
+        if field not in self.values:
+            raise ValueError(f"can't group by {field!r}, choose from {list(self.values)}")
+        if field in self._groups:
+            return self._groups[field]
+        if self._postings is None:
+            self._build()
+        if field in categorical_fields:
+            postings = self._postings[field]
+            group_values = sorted(postings)
+            sizes = [len(postings[value]) for value in group_values]
+            rows = np.concatenate([postings[value] for value in group_values] or [np.zeros(0, dtype=np.int64)])
+            codes = np.repeat(np.arange(len(group_values)), sizes)
+        else:
+            values, rows = self._sorted[field]
+            starts = np.r_[True, values[1:] != values[:-1]] if len(values) else np.zeros(0, dtype=bool)
+            codes = np.cumsum(starts) - 1
+            group_values = [self.values[field][row] for row in rows[starts].tolist()]
+        stints = self.stints()
+        if stints:
+            if field == "team":
+                # a team with a stint row takes it instead of the season total
+                code_of = {value: code for code, value in enumerate(group_values)}
+                dropped = [code_of[team] * len(self) + total for total, by_team in stints.items() for team in by_team]
+                kept = ~np.isin(codes * len(self) + rows, dropped)
+            else:
+                kept = ~np.isin(rows, [row for by_team in stints.values() for row in by_team.values()])
+            codes, rows = codes[kept], rows[kept]
+        self._groups[field] = (group_values, codes, rows)
+        return self._groups[field]
+
+    def id_rank(self):
+        # method returns where each row's Player.id falls in sorted order, to break score ties like top_n_indices
+        if self._id_rank is None:
+            ids = [f"{name}_{team}" for name, team in zip(self.names, self.values["team"])]
+            id_rank = np.empty(len(ids), dtype=np.int64)
+            id_rank[sorted(range(len(ids)), key=ids.__getitem__)] = np.arange(len(ids))
+            self._id_rank = id_rank
+        return self._id_rank
+
+
+def scenario_key(weights):
+    # function turns a weight dictionary into a canonical key (same weights in any order give the same key)
+    return tuple(sorted((stat, float(value)) for stat, value in weights.items()))
+
+
+"""
+ScenarioCache is the bounded LRU cache the RankingSystem keeps of scenario results.
+Each entry is the ScoreResult for one weight profile. The least recently used entry is evicted when the cache is
+full, and with a ttl (in seconds) entries also expire. The hit/miss/eviction counters
+can be read with stats() for monitoring
+"""
+class ScenarioCache:
+    def __init__(self, maxsize: int = 128, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        # method returns the entry for key (or None), counting it as a hit or a miss
+        entry = self._entries.get(key)
+        if entry is not None and self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+            del self._entries[key]
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, result):
+        # method stores a result for key and evicts the oldest entries past maxsize
+        if self.maxsize <= 0:
+            return result
+        self._entries[key] = (result, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return result
+
+    def clear(self):
+        # method drops every entry (used when the players or stats change)
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "size": len(self._entries),
+            "maxsize": self.maxsize
+        }
+
+
+"""
+ScoreResult is what RankingSystem.score returns: the score of every player for one set
+of weights, tied to the data version it was calculated from. It can't be changed after
+it's made (the scores array is read only), so the same result can be shared between
+threads and reused from the cache without anyone overwriting it
+"""
+class ScoreResult:
+    __slots__ = ("weights", "data_version", "scores", "rows", "_players", "_order", "_id_rank")
+
+    def __init__(self, weights, data_version, scores, players, rows=None, id_rank=None):
+        scores = np.array(scores, dtype=float)
+        scores.setflags(write=False)
+        object.__setattr__(self, "weights", dict(weights))
+        object.__setattr__(self, "data_version", data_version)
+        object.__setattr__(self, "scores", scores)
+        # for a filtered ranking the RankingSystem rows that were scored (None means every player)
+        object.__setattr__(self, "rows", rows)
+        # the pool itself is shared, not copied for every cached result. Players are only ever
+        # appended to it, so the rows that were scored keep their places
+        object.__setattr__(self, "_players", players)
+        object.__setattr__(self, "_order", [])
+        # id_rank() returns where each pool row's Player.id falls in sorted order, so the full
+        # order can be one lexsort instead of sorting every player by their id string
+        object.__setattr__(self, "_id_rank", id_rank)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ScoreResult can't be changed")
+
+    def top_indices(self, top_n=10):
+        # method returns the positions of the top_n players, reusing the order already worked out
+        if top_n is None:
+            top_n = len(self.scores)
+        order = self._order
+        if len(order) < min(top_n, len(self.scores)):
+            if top_n >= len(self.scores) and self._id_rank is not None:
+                # same order as top_n_indices: highest score first, ties to the lower Player.id
+                id_rank = self._id_rank()
+                id_rank = id_rank[:len(self.scores)] if self.rows is None else id_rank[self.rows]
+                order = np.lexsort((id_rank, -self.scores)).tolist()
+            else:
+                order = top_n_indices(self.scores, top_n, lambda i: self._player(i).id)
+            # two threads may both work this out, but they get the same answer
+            object.__setattr__(self, "_order", order)
+        return order[:top_n]
+
+    def top(self, top_n=10):
+        # method returns the top_n (player, score) pairs, best first
+        return [(self._player(i), float(self.scores[i])) for i in self.top_indices(top_n)]
+
+    def _player(self, i):
+        # method returns the player of score i
+        return self._players[i if self.rows is None else int(self.rows[i])]
+
+    def score_of(self, player):
+        # method returns one player's score in this result, found from the player's matrix row
+        row = player._row
+        if row is not None:
+            i = row if self.rows is None else int(np.searchsorted(self.rows, row))
+            if i < len(self.scores) and self._player(i) is player:
+                return float(self.scores[i])
+        raise ValueError(f"{player.name} wasn't scored in this result")
+
+
+# the aggregates rank_groups works out for each group
+group_aggregates = ("count", "mean", "max", "minutes_weighted")
+
+
+"""
+GroupRanking is what RankingSystem.rank_groups returns for one set of weights: the sorted
+group values of a field, the top (player, score) pairs of each group, and per group
+aggregates of the scores as arrays lined up with the groups. minutes_weighted is the mean
+score weighted by each player's total minutes (games played x minutes per game), so a
+starter counts for more of a team than someone who played ten games
+"""
+class GroupRanking:
+    def __init__(self, field, groups, aggregates, top):
+        self.field = field
+        self.groups = groups
+        self.aggregates = aggregates
+        self._top = top
+
+    def __len__(self):
+        return len(self.groups)
+
+    def top(self, group):
+        # method returns the best (player, score) pairs of one group, best first
+        return self._top.get(group, [])
+
+    def table(self, sort_by="mean"):
+        # method returns one row per group with its aggregates, highest sort_by first
+        if sort_by not in self.aggregates:
+            raise ValueError(f"can't sort by {sort_by!r}, choose from {list(self.aggregates)}")
+        order = np.lexsort((np.arange(len(self.groups)), -self.aggregates[sort_by]))
+        return [dict({self.field: self.groups[i]}, **{name: values[i].item() for name, values in self.aggregates.items()})
+                for i in order.tolist()]
+
+
+"""
+Normalizers turn the raw (players x stats) values into the normalized stats the weights
+are applied to. Each one works on every column at once and gives 0 for a missing (NaN)
+stat and for a stat where every player is equal.
+min-max:    (value - min) / (max - min), between 0 and 1
+z-score:    (value - mean) / standard deviation
+robust:     (value - median) / interquartile range, so one outlier barely moves anyone else
+percentile: share of the other players with a lower value, between 0 and 1 (ties share the average)
+"""
+def minmax_normalize(values):
+    min_values = np.fmin.reduce(values, axis=0)
+    spans = np.fmax.reduce(values, axis=0) - min_values
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.nan_to_num(np.where(spans > 0, (values - min_values) / spans, 0.0))
+
+
+def zscore_normalize(values):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.nanmean(values, axis=0)
+        stds = np.nanstd(values, axis=0)
+        return np.nan_to_num(np.where(stds > 0, (values - means) / stds, 0.0))
+
+
+def robust_normalize(values):
+    # nanpercentile is much slower than percentile, so it's only used when something is missing
+    percentile = np.nanpercentile if np.isnan(values).any() else np.percentile
+    with np.errstate(invalid="ignore", divide="ignore"):
+        q1, median, q3 = percentile(values, [25, 50, 75], axis=0)
+        spreads = q3 - q1
+        return np.nan_to_num(np.where(spreads > 0, (values - median) / spreads, 0.0))
+
+
+def percentile_normalize(values):
+    # one argsort of every column (NaN sorts last), then each run of equal values gets the
+    # average of its positions, so it's O(n log n) instead of comparing every pair of players
+    # the work is done on the transposed copy so every column is contiguous
+    columns = np.ascontiguousarray(values.T)
+    norm = np.zeros(columns.shape)
+    order = np.argsort(columns, axis=1)
+    counts = np.count_nonzero(~np.isnan(columns), axis=1)
+    for col, count in enumerate(counts.tolist()):
+        if count < 2:
+            continue
+        rows = order[col, :count]
+        sorted_values = columns[col, rows]
+        starts = np.flatnonzero(np.r_[True, sorted_values[1:] != sorted_values[:-1]])
+        if len(starts) == 1:
+            continue
+        ends = np.r_[starts[1:], count]
+        norm[col, rows] = np.repeat((starts + ends - 1) / (2 * (count - 1)), ends - starts)
+    return norm.T
+
+
+normalizers = {
+    "minmax": minmax_normalize,
+    "zscore": zscore_normalize,
+    "robust": robust_normalize,
+    "percentile": percentile_normalize
+}
+
+
 """
 The RankingSystem Class unlike the player class manages the entire dataset instead of just one player 
 It takes a list of Player objects from the player class and handles all the ranking aspects of the project. 
@@ -69,7 +1216,8 @@ The methods add player objects, filters the list, normalizes all the statistics,
 finally puts the ranked players into a list 
 """
 class RankingSystem:
-    def __init__(self, min_games_played: int = 20, min_minutes_played: int = 15, weights: dict = None):
+    def __init__(self, min_games_played: int = 20, min_minutes_played: int = 15, weights: dict = None,
+                 cache_size: int = 128, cache_ttl: float = None, normalizer="minmax"):
         # all the attributes from the ranking class
         self.players = [] # list of player objects
         # thresholds to filter the list of player objects
@@ -80,6 +1228,32 @@ class RankingSystem:
         self.norm_max = {}
         # weights for each situation 
         self.weights = weights
+        # columnar store that holds the stats of every player in the pool
+        self.matrix = StatMatrix()
+        self.matrix.refresh_norm = self.calculate_min_max
+        # matrix version the normalized stats were last calculated for (-1 means never)
+        self._norm_version = -1
+        # min/max arrays used to update the normalization incrementally
+        self._min_values = None
+        self._max_values = None
+        # normalizer name (from normalizers) or function, and the normalized stats other
+        # normalizers left behind, as normalizer: (matrix version, normalized stats)
+        self._normalizer = self._check_normalizer(normalizer)
+        self._norm_cache = {}
+        # name index, built the first time a player is looked up
+        self._name_index = None
+        # the last similarity index built, as (key, SimilarityIndex)
+        self._similarity = None
+        # cache of scenario results and the matrix version they belong to
+        self.scenario_cache = ScenarioCache(cache_size, cache_ttl)
+        self._cache_version = -1
+        # secondary indexes for filtered rankings, and the normalized stats of filtered subsets
+        # (filter, normalizer and version: (rows, normalized stats))
+        self._attribute_index = None
+        self._attribute_version = 0
+        self.subset_cache = ScenarioCache(32)
+        # normalization and the cache are shared, so only one thread at a time can use them
+        self._lock = threading.RLock()
     def add_player(self, player_or_list):
         # method can be used to add individual player objects and full lists of player objects
         if isinstance(player_or_list, list):
@@ -88,39 +1262,175 @@ class RankingSystem:
         else:
             # filtering aspect of the add_player method to remove the benchwarmers (players with low outliers)
             if player_or_list.games_played >= self.min_games_played and player_or_list.min_played >= self.min_minutes_played: 
+                # the player's stats are moved into the matrix and the player keeps views into its row
+                row = self.matrix.append_row(player_or_list.stats)
+                player_or_list.stats = StatView(self.matrix, row)
+                player_or_list.norm_stats = StatView(self.matrix, row, normalized=True)
                 self.players.append(player_or_list)
+    def add_columns(self, columns):
+        """
+        This method adds a whole PlayerColumns block (from PlayerCsvLoader) at once.
+        The same games/minutes filter as add_player is done with array masks and
+        the stats are copied into the matrix in one block. It returns the new players
+        """
+        keep = (columns.games_played >= self.min_games_played) & (columns.min_played >= self.min_minutes_played)
+        kept = columns.select(keep)
+        start = self.matrix.append_rows(kept.stats, kept.stat_names)
+        new_players = []
+        for i, player in enumerate(kept.iter_players(stats=False)):
+            player.stats = StatView(self.matrix, start + i)
+            player.norm_stats = StatView(self.matrix, start + i, normalized=True)
+            new_players.append(player)
+        self.players.extend(new_players)
+        return new_players
+    def update_players(self, players, stat_names, values):
+        """
+        This method writes new stats for some players already in the pool as one
+        (players x stat_names) block. Only the changed cells go in the change log, so the next
+        normalization is incremental. The filter indexes are built again since the players'
+        team, age, games or minutes may have changed with their stats
+        """
+        with self._lock:
+            self.matrix.set_rows(np.array([player._row for player in players], dtype=np.int64), stat_names, values)
+            self._attribute_index = None
+    @staticmethod
+    def _check_normalizer(normalizer):
+        if normalizer not in normalizers and not callable(normalizer):
+            raise ValueError(f"unknown normalizer {normalizer!r}, choose from {list(normalizers)} or pass a function")
+        return normalizer
+
+    @property
+    def normalizer(self):
+        return self._normalizer
+
+    @normalizer.setter
+    def normalizer(self, normalizer):
+        """
+        Switching the normalizer keeps the current normalized stats aside, so switching back
+        while the data hasn't changed doesn't normalize again. Scenario results are cached
+        per normalizer, so they're kept too
+        """
+        self._check_normalizer(normalizer)
+        with self._lock:
+            if normalizer == self._normalizer:
+                return
+            matrix = self.matrix
+            if self._norm_version == matrix.version and matrix.has_norm:
+                self._norm_cache[self._normalizer] = (matrix.version, matrix.norm[:matrix.size].copy())
+            self._normalizer = normalizer
+            version, norm = self._norm_cache.pop(normalizer, (-1, None))
+            if version == matrix.version:
+                matrix.norm[:matrix.size] = norm
+            else:
+                version = -1
+            self._norm_version = version
     def normalize_value(self, value, min_value, max_value):
         # this method runs the normalize formula that can be used for all the stats
         if max_value == min_value: 
             return 0
         return (value - min_value) / (max_value - min_value)
-    def calculate_min_max(self):
+    @instrumented("calculate_min_max", lambda result, arguments: arguments["self"].matrix.size)
+    def calculate_min_max(self, force=False):
         """
         This method is used to apply the min max formula to all the values 
-        for each stat that is included for each player, This is done by looping through all the keys in stats to 
-        find the normal min and normal max for each stat. Then the players list is looped through to apply the normalize
-        statistic formula to each stat 
-
+        for each stat that is included for each player. Since the stats are stored in the
+        StatMatrix, the normal min and normal max of every stat are found with one column-wise
+        operation, and then the whole matrix is normalized at once with the same formula
+        as normalize_value (a stat where every player is equal normalizes to 0).
+        The results are cached, so if no player was added and no stat was changed since the
+        last call nothing is recalculated (unless force is True). When only a few stats changed
+        or a few players were added, the min and max are updated incrementally instead.
+        With a different normalizer the whole matrix is normalized with it instead
         """
-        if not self.players:
+        if self.matrix.size == 0:
             return 
-        
-        stats_keys = self.players[0].stats.keys()
-        for key in stats_keys:
-            all_values = [player.stats[key] for player in self.players]
-            self.norm_min[key] = min(all_values)
-            self.norm_max[key] = max(all_values)
-        
-        for player in self.players:
-            player.norm_stats = {}
-            for key in stats_keys:
-                min_val = self.norm_min[key]
-                max_val = self.norm_max[key]
-                if max_val == min_val:
-                    player.norm_stats[key] = 0 
-                else:
-                    player.norm_stats[key] = self.normalize_value(player.stats[key], min_val, max_val)
-
+        matrix = self.matrix
+        if not force and self._norm_version == matrix.version:
+            return
+        # the lock keeps a second thread from reading the bounds while they're being updated
+        with self._lock:
+            if not force and self._norm_version == matrix.version:
+                return
+
+            changes = matrix.changes
+            if self._normalizer != "minmax":
+                values = matrix.values[:matrix.size]
+                normalize = normalizers.get(self._normalizer, self._normalizer)
+                matrix.norm[:matrix.size] = normalize(values)
+                min_values, max_values = np.fmin.reduce(values, axis=0), np.fmax.reduce(values, axis=0)
+            # a logged change costs about as much as normalizing 50 cells in the full pass
+            elif (force or self._norm_version < 0 or changes is None
+                  or len(changes) > max(64, matrix.size * len(matrix.stat_names) // 50)):
+                self._full_min_max()
+                min_values, max_values = self._min_values, self._max_values
+            else:
+                self._incremental_min_max(changes)
+                min_values, max_values = self._min_values, self._max_values
+            matrix.changes = []
+            matrix.has_norm = True
+            self.norm_min = dict(zip(matrix.stat_names, min_values.tolist()))
+            self.norm_max = dict(zip(matrix.stat_names, max_values.tolist()))
+            self._norm_version = matrix.version
+
+    def _full_min_max(self):
+        # method recalculates the min, max and normalized value of every stat from scratch
+        matrix = self.matrix
+        values = matrix.values[:matrix.size]
+        # fmin/fmax skip the NaN values left by missing or non numeric stats
+        self._min_values = np.fmin.reduce(values, axis=0)
+        self._max_values = np.fmax.reduce(values, axis=0)
+        spans = self._max_values - self._min_values
+        with np.errstate(invalid="ignore", divide="ignore"):
+            norm = np.where(spans > 0, (values - self._min_values) / spans, 0.0)
+        matrix.norm[:matrix.size] = np.nan_to_num(norm)
+
+    def _incremental_min_max(self, changes):
+        """
+        This method finds the new min and max of each changed stat from the change log instead
+        of going over the whole matrix. A new value can only widen a stat's range, so that's
+        one comparison. Only a stat where a changed cell held the old min or max is scanned
+        again, with one pass over its column. A stat column is only normalized again if its
+        min or max actually moved, otherwise only the changed values are normalized
+        """
+        matrix = self.matrix
+        new_rows = [row for row, col, old in changes if col < 0]
+        new_row_set = set(new_rows)
+        # the bounds were worked out with the first old value of each changed cell
+        first_old = {}
+        for row, col, old in changes:
+            if col >= 0 and row not in new_row_set:
+                first_old.setdefault((row, col), old)
+        changed_cells = {col: [] for col in range(len(matrix.stat_names))} if new_rows else {}
+        old_values = {}
+        for (row, col), old in first_old.items():
+            changed_cells.setdefault(col, []).append(row)
+            old_values.setdefault(col, []).append(old)
+
+        for col, rows in changed_cells.items():
+            rows = rows + new_rows
+            old_min, old_max = self._min_values[col], self._max_values[col]
+            olds = np.array(old_values.get(col, ()), dtype=float)
+            if np.any(olds == old_min) or np.any(olds == old_max):
+                column = matrix.values[:matrix.size, col]
+                new_min, new_max = np.fmin.reduce(column), np.fmax.reduce(column)
+            else:
+                current = matrix.values[rows, col]
+                new_min, new_max = np.fmin(old_min, np.fmin.reduce(current)), np.fmax(old_max, np.fmax.reduce(current))
+            bounds_moved = not (_same_float(new_min, old_min) and _same_float(new_max, old_max))
+            self._min_values[col] = new_min
+            self._max_values[col] = new_max
+            self._normalize_cells(slice(0, matrix.size) if bounds_moved else rows, col)
+
+    def _normalize_cells(self, rows, col):
+        # method normalizes some rows (or a slice of rows) of one stat column with the current min and max
+        min_val = self._min_values[col]
+        span = self._max_values[col] - min_val
+        values = self.matrix.values[rows, col]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            norm = (values - min_val) / span if span > 0 else np.zeros_like(values)
+        self.matrix.norm[rows, col] = np.nan_to_num(norm)
+
+    @instrumented("apply_weights", lambda result, arguments: len(arguments["self"].players))
     def apply_weights(self):
         """
         This method applies the weights to all the players in the players list.
@@ -129,34 +1439,332 @@ class RankingSystem:
         through the player objects in the player list
 
         """
-        if not self.weights:
+        if not self.weights or not self.players:
             return 
-        for player in self.players:
-            valid_weights = {k:v for k,v in self.weights.items() if k in player.norm_stats} 
-            player.score = player.calculate_score(valid_weights)
-    def rank_player(self, top_n = 10):
+        self.apply_result(self.score(self.weights))
+    def weight_matrix(self, weight_dicts):
+        """
+        This method stacks several weight dictionaries into one weight matrix (one column per
+        dictionary). Only the stats that are in the StatMatrix are kept, just like apply_weights
+        only uses the valid weights. It returns the stat columns used and the matrix, so the
+        scores for every weight dictionary are norm[:, cols] @ weight_matrix
+        """
+        stat_index = self.matrix.stat_index
+        cols = []
+        rows = {}
+        for weights in weight_dicts:
+            for stat in weights:
+                if stat in stat_index and stat not in rows:
+                    rows[stat] = len(cols)
+                    cols.append(stat_index[stat])
+        weight_matrix = np.zeros((len(cols), len(weight_dicts)))
+        for j, weights in enumerate(weight_dicts):
+            for stat, value in weights.items():
+                if stat in rows:
+                    weight_matrix[rows[stat], j] = value
+        return cols, weight_matrix
+    @instrumented("rank_player", lambda result, arguments: len(arguments["self"].players))
+    def rank_player(self, top_n = 10, with_ranks=False):
         # This method actually ranks the players based of the score for each situation 
-        # (reverse order)
-
-        ranked_players = sorted(self.players, key=lambda player: player.score, reverse=True)
-        
-        return ranked_players[:top_n]
+        # (reverse order). Only the top_n players are picked out and sorted, ties go to the lower id
+        # with_ranks=True returns (rank, player, score) tuples instead of just the players
+        scores = self.matrix.scores
+        if scores is None or len(scores) != len(self.players):
+            return select_top_players(self.players, top_n, with_ranks)
+        order = top_n_indices(scores, top_n, lambda i: self.players[i].id)
+        if with_ranks:
+            return [(rank, self.players[i], float(scores[i])) for rank, i in enumerate(order, 1)]
+        return [self.players[i] for i in order]
     
     def normalize_and_rank(self):
         # this method combines multiple methods to quickly normalize and rank players
         self.calculate_min_max() # normalize stats method
         self.apply_weights() # weights applied to find the score
         return self.rank_player() # finally based of the score the players are ranked
+    @instrumented("rank_by_situation", lambda result, arguments: len(arguments["self"].players))
     def rank_by_situation(self, weights, top_n=10):
         """
         This method ranks the players based of the score from different situations instead 
         of just the standard overall ranking weights
         The system updates the active weights that the score was calulcated with based
-        of the chosen situation
+        of the chosen situation.
+        The scores and order come from the scenario cache when these weights were ranked before.
+        This is the old interface that sets Player.score, use score()/rank() to rank without
+        changing any shared state
         """
         self.weights = weights
-        self.normalize_and_rank()
-        return self.rank_player(top_n)
+        result = self.score(weights)
+        self.apply_result(result)
+        return [player for player, score in result.top(top_n)]
+    def score(self, weights, filters=None, normalize="pool") -> "ScoreResult":
+        """
+        This method scores every player for one set of weights and returns an immutable
+        ScoreResult (nothing on the players changes). Results come from the scenario cache
+        when possible. It's safe to call from many threads on the same RankingSystem.
+        With filters (see filter_key) only the players passing them are scored. normalize="pool"
+        uses the normalized stats of the whole pool, "subset" normalizes within the filtered players
+        """
+        if normalize not in ("pool", "subset"):
+            raise ValueError(f"normalize has to be 'pool' or 'subset', not {normalize!r}")
+        key_filters = filter_key(filters)
+        with self._lock:
+            self._check_cache_version()
+            key = self._cache_key(weights)
+            if key_filters:
+                key += (key_filters, normalize)
+            result = self.scenario_cache.get(key)
+            if result is None and not key_filters:
+                names, scores = self.score_many({"scenario": weights})
+                result = ScoreResult(weights, self.matrix.version, scores[:, 0], self.players, id_rank=self._id_rank)
+                result = self.scenario_cache.put(key, result)
+            elif result is None:
+                rows, norm = self._filtered_stats(key_filters, normalize)
+                cols, weight_matrix = self.weight_matrix([weights])
+                scores = norm[:, cols] @ weight_matrix[:, 0]
+                result = ScoreResult(weights, self.matrix.version, scores, self.players, rows, id_rank=self._id_rank)
+                result = self.scenario_cache.put(key, result)
+            return result
+    def rank(self, weights, top_n=10, filters=None, normalize="pool"):
+        # method returns the top_n (player, score) pairs for the weights without changing Player.score
+        return self.score(weights, filters, normalize).top(top_n)
+    @instrumented("rank_groups", lambda result, arguments: len(arguments["self"].players))
+    def rank_groups(self, weights, by="team", top_n=5, filters=None, normalize="pool"):
+        """
+        This method ranks the players within every group of a field (team, position, age...)
+        and works out each group's aggregates, all groups in one pass instead of one ranking
+        per group: the entries are sorted once by (group, score) so each group's top_n are the
+        first entries of its run, and the aggregates are sums over the runs. Traded players
+        are grouped like PlayerAttributeIndex.groups says. The scores come from score, so
+        filters, normalize and the scenario cache work the same way
+        """
+        result = self.score(weights, filters, normalize)
+        with self._lock:
+            index = self.attribute_index()
+            group_values, codes, rows = index.groups(by)
+            scores = np.full(len(index), np.nan)
+            scores[result.rows if result.rows is not None else np.arange(len(result.scores))] = result.scores
+            scores = scores[rows]
+            kept = ~np.isnan(scores)
+            codes, rows, scores = codes[kept], rows[kept], scores[kept]
+            # one sort by (group, score), with each entry's place in the score order as an integer key
+            score_order = np.empty(len(scores), dtype=np.int64)
+            score_order[np.argsort(-scores)] = np.arange(len(scores))
+            order = np.argsort(codes * len(scores) + score_order)
+            codes, rows, scores = codes[order], rows[order], scores[order]
+            if np.any((codes[1:] == codes[:-1]) & (scores[1:] == scores[:-1])):
+                # equal scores in a group go to the lower id, only worked out when there are any
+                order = np.lexsort((index.id_rank()[rows], -scores, codes))
+                codes, rows, scores = codes[order], rows[order], scores[order]
+            minutes = index.column("games_played")[rows] * index.column("min_played")[rows]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.zeros(0, dtype=np.int64)
+        counts = np.diff(np.r_[starts, len(codes)])
+        if len(starts):
+            total_minutes = np.add.reduceat(minutes, starts)
+            weighted = np.add.reduceat(scores * minutes, starts)
+            aggregates = {
+                "count": counts,
+                "mean": np.add.reduceat(scores, starts) / counts,
+                "max": scores[starts],
+                "minutes_weighted": np.divide(weighted, total_minutes, out=np.full(len(starts), np.nan),
+                                              where=total_minutes > 0)
+            }
+        else:
+            aggregates = {name: np.zeros(0) for name in group_aggregates}
+        top = {}
+        position = np.arange(len(codes)) - np.repeat(starts, counts)
+        for code, row, score in zip(*(values[position < top_n].tolist() for values in (codes, rows, scores))):
+            top.setdefault(group_values[code], []).append((self.players[row], score))
+        return GroupRanking(by, [group_values[code] for code in codes[starts].tolist()], aggregates, top)
+    def attribute_index(self):
+        """
+        This method returns the secondary indexes, only adding the players added since they were
+        last used. They are built again when a player's name, team, position, age, games or
+        minutes changed (Player bumps StatMatrix.info_version)
+        """
+        if self._attribute_index is None or self._attribute_version != self.matrix.info_version:
+            self._attribute_index = PlayerAttributeIndex(self.players)
+            self._attribute_version = self.matrix.info_version
+        elif len(self._attribute_index) < len(self.players):
+            self._attribute_index.add(self.players[len(self._attribute_index):])
+        return self._attribute_index
+    def _id_rank(self):
+        # method returns the Player.id rank of every row, how a ScoreResult breaks score ties in its full order
+        with self._lock:
+            return self.attribute_index().id_rank()
+    def filter_rows(self, filters):
+        # method returns the rows of the players that pass the filters, resolved through the secondary indexes
+        return np.flatnonzero(self.attribute_index().mask(filter_key(filters)))
+    def _filtered_stats(self, key_filters, normalize):
+        """
+        This method returns the rows passing a filter and their normalized stats. With "subset"
+        the normalizer only sees those rows, and the result is kept in subset_cache for this
+        filter, normalizer and data version so the bounds aren't worked out again
+        """
+        cache_key = (key_filters, normalize, self._normalizer, self.matrix.version)
+        cached = self.subset_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        self.calculate_min_max()
+        rows = np.flatnonzero(self.attribute_index().mask(key_filters))
+        if normalize == "pool":
+            norm = self.matrix.norm[rows]
+        else:
+            normalize_values = normalizers.get(self._normalizer, self._normalizer)
+            norm = normalize_values(self.matrix.values[rows]) if len(rows) else np.zeros((0, len(self.matrix.stat_names)))
+        return self.subset_cache.put(cache_key, (rows, norm))
+    def apply_result(self, result):
+        # method makes Player.score show the scores of this result (the old shared state behaviour)
+        with self._lock:
+            self.matrix.scores = np.array(result.scores)
+    def _cache_key(self, weights):
+        # the key has the weights, the filter thresholds, the normalizer and the data version in it
+        return (scenario_key(weights), self.min_games_played, self.min_minutes_played, self._normalizer,
+                self.matrix.version)
+    def _check_cache_version(self):
+        # any change to the players or stats makes every cached result stale
+        self.calculate_min_max()
+        version = (self.matrix.version, self.matrix.info_version)
+        if self._cache_version != version:
+            self.scenario_cache.clear()
+            self.subset_cache.clear()
+            self._cache_version = version
+    def cache_stats(self):
+        # method returns the hit/miss/eviction counters of the scenario cache
+        return self.scenario_cache.stats()
+    def rank_many(self, scenarios: dict, top_n=10, filters=None, normalize="pool"):
+        """
+        This method ranks the players for many situations at once. All the weight dictionaries
+        are stacked into one weight matrix so the pool is normalized once and every player is
+        scored under every scenario with a single matrix multiply. It returns a dictionary with
+        the top_n (player, score) pairs for each scenario name. Player.score is left alone
+        since each player has a different score in each scenario. Scenarios already in the
+        scenario cache are reused and only the rest are scored. filters and normalize work
+        like they do for score
+        """
+        if not self.players or not scenarios:
+            return {name: [] for name in scenarios}
+        if filters:
+            return {name: self.rank(weights, top_n, filters, normalize) for name, weights in scenarios.items()}
+        with self._lock:
+            self._check_cache_version()
+            results = {name: self.scenario_cache.get(self._cache_key(weights)) for name, weights in scenarios.items()}
+            missing = {name: scenarios[name] for name, result in results.items() if result is None}
+            if missing:
+                names, scores = self.score_many(missing)
+                for j, name in enumerate(names):
+                    result = ScoreResult(missing[name], self.matrix.version, scores[:, j], self.players,
+                                         id_rank=self._id_rank)
+                    results[name] = self.scenario_cache.put(self._cache_key(missing[name]), result)
+        # same partial selection and tie breaking as rank_player
+        return {name: result.top(top_n) for name, result in results.items()}
+    def score_many(self, scenarios: dict):
+        # method normalizes the pool (if needed) and returns the scenario names and a
+        # (players x scenarios) score matrix, it works on the matrix alone so no Player objects are needed
+        self.calculate_min_max()
+        names = list(scenarios)
+        cols, weight_matrix = self.weight_matrix([scenarios[name] for name in names])
+        return names, self.matrix.norm[:self.matrix.size, cols] @ weight_matrix
+    def sweep_weights(self, base_weights: dict, ranges: dict, samples=1000, top_n=10, seed=None,
+                      memory_budget_mb=256):
+        """
+        This method checks how stable the top_n of base_weights is when the weights move around.
+        It samples weight vectors with sample_weight_vectors, normalizes the pool once and scores
+        the vectors a chunk at a time (chunk of the weight matrix @ norm), with the chunk size
+        picked so everything a chunk allocates (the scores, np.argpartition's copy and indices
+        and the pair arrays of the Kendall tau) stays within memory_budget_mb. Each chunk's
+        top_n comes from one np.argpartition call, so no vector needs its own ranking pass. Ties at the top_n
+        cutoff of a sampled vector are decided arbitrarily. It returns a SweepResult
+        """
+        stat_names, weights = sample_weight_vectors(base_weights, ranges, samples, seed)
+        with self._lock:
+            base = self.score(base_weights)
+            matrix = self.matrix
+            # stats the pool doesn't have are left out, like weight_matrix does
+            known = [i for i, stat in enumerate(stat_names) if stat in matrix.stat_index]
+            # the columns are copied before the lock is let go, so a reload or an incremental
+            # normalization can't change them halfway through the sweep. Scores are worked out
+            # as (vectors x players) so each vector's scores are contiguous
+            columns = [matrix.stat_index[stat_names[i]] for i in known]
+            stats = np.ascontiguousarray(matrix.norm[:matrix.size, columns].T)
+        n = len(base.scores)
+        top_n = max(1, min(top_n, n))
+        base_top = np.array(base.top_indices(top_n), dtype=int)
+        in_base_top = np.zeros(n, dtype=bool)
+        in_base_top[base_top] = True
+
+        tau = np.full(samples, np.nan)
+        overlap = np.full(samples, np.nan)
+        top_counts = np.zeros(n, dtype=np.int64)
+        # per vector in a chunk: the scores and np.argpartition's int64 indices (kept by top) are
+        # 2 x 8 bytes per player, plus either argpartition's copy of the scores (8 per player) or
+        # kendall_tau_columns' two pair blocks and their difference (3 x 8 per pair), whichever
+        # is bigger. The base top_n's scores, bincount's copy of top and the mask add 3 x 8 per
+        # top player, and the chunk's copy of the weights 8 per stat. What the whole sweep keeps
+        # comes off the budget first
+        pairs = top_n * (top_n - 1) // 2
+        per_vector = 16 * n + max(8 * n, 24 * pairs) + 24 * top_n + 8 * len(known)
+        kept = stats.nbytes + weights.nbytes + tau.nbytes + overlap.nbytes + top_counts.nbytes + in_base_top.nbytes
+        chunk = max(1, int((memory_budget_mb * 1e6 - kept) // per_vector))
+        for start in range(0, samples if n else 0, chunk):
+            stop = min(start + chunk, samples)
+            scores = weights[known, start:stop].T @ stats
+            top = np.argpartition(scores, n - top_n, axis=1)[:, n - top_n:]
+            top_counts += np.bincount(top.ravel(), minlength=n)
+            overlap[start:stop] = in_base_top[top].sum(axis=1) / top_n
+            tau[start:stop] = kendall_tau_columns(base.scores[base_top], scores[:, base_top].T)
+        return SweepResult(self.players[:n], stat_names, weights, base.top(top_n), tau, overlap, top_counts)
+    def similarity_index(self, metric="cosine", weights=None, stats=None):
+        """
+        This method returns a SimilarityIndex over the normalized stats of every player. stats
+        picks the stats compared (all of them by default) and weights scales each one (1 for a
+        stat not in weights), so with euclidean it's a weighted euclidean distance. The last
+        index is kept until the data, normalizer or arguments change
+        """
+        weights = weights or {}
+        if any(value < 0 for value in weights.values()):
+            raise ValueError("similarity weights can't be negative")
+        with self._lock:
+            self.calculate_min_max()
+            matrix = self.matrix
+            stat_names = [stat for stat in (stats or matrix.stat_names) if stat in matrix.stat_index]
+            key = (metric, scenario_key(weights), tuple(stat_names), self._normalizer, matrix.version)
+            if self._similarity is None or self._similarity[0] != key:
+                scale = np.sqrt([weights.get(stat, 1.0) for stat in stat_names])
+                vectors = matrix.norm[:matrix.size, [matrix.stat_index[stat] for stat in stat_names]] * scale
+                self._similarity = (key, SimilarityIndex(vectors, metric))
+            return self._similarity[1]
+    def similar_players(self, player, k=20, metric="cosine", weights=None, stats=None):
+        """
+        This method returns the k players most like player as (player, value) pairs, most alike
+        first. value is the cosine similarity, or the distance for euclidean. player can be a
+        Player in this system or a name (the best name match is used)
+        """
+        if isinstance(player, str):
+            matches = self.find_players(player, limit=1)
+            if not matches:
+                raise ValueError(f"no player found matching {player!r}")
+            player = matches[0]
+        if player._matrix is not self.matrix:
+            raise ValueError(f"{player.name} isn't in this ranking system")
+        rows, values = self.similarity_index(metric, weights, stats).neighbors(player._row, k)
+        return [(self.players[row], value) for row, value in zip(rows.tolist(), values.tolist())]
+    def similarity_table(self, k=10, metric="cosine", weights=None, stats=None):
+        # method returns every player's k most alike players as (players x k) row and value arrays
+        return self.similarity_index(metric, weights, stats).table(k)
+    def name_index(self):
+        # method returns the name index, only indexing the players added since it was last used
+        if self._name_index is None:
+            self._name_index = PlayerIndex(self.players)
+        elif len(self._name_index) < len(self.players):
+            self._name_index.add(self.players[len(self._name_index):])
+        return self._name_index
+    def find_players(self, query, limit=None):
+        # method returns all the players matching the name query, best match first
+        return self.name_index().search(query, limit)
+    def find_player_by_id(self, player_id):
+        # method looks up one player by Player.id
+        return self.name_index().by_id(player_id)
+    @instrumented("to_dict_list", lambda result, arguments: len(result))
     def to_dict_list(self, top_n= None):
         """
         This method is used to transfer the players from a dictionary 
@@ -168,47 +1776,563 @@ class RankingSystem:
             players_to_export = self.players
         dict_list = [player.to_dict() for player in players_to_export]
         return dict_list
+    def iter_flat_dicts(self, top_n=None):
+        """
+        This method is the streaming version of flatten_player_dicts(self.to_dict_list(top_n)),
+        it yields one flat dictionary per player (normalized stats end in norm_suffix)
+        """
+        self.calculate_min_max()
+        return iter_flat_players(self.rank_player(top_n) if top_n else self.players)
+    def to_dataframe(self, top_n=None, include_norm=True):
+        # method builds the flat pandas DataFrame of the players (or the top_n) from the matrix columns in one step
+        self.calculate_min_max()
+        return players_to_dataframe(self.rank_player(top_n) if top_n else self.players, include_norm)
 
         
 
-def read_csv_as_dicts(filename):
+# columns of the CSV that describe the player instead of being a stat
+non_stat_fields = ("Player", "Team", "Pos", "Age", "G", "MP")
+
+
+"""
+PlayerColumns is the bulk columnar result of loading a player CSV. The player info
+is kept in lists/arrays (one entry per player) and the stats are one float matrix
+with a column per stat name, so it can go straight into a RankingSystem's StatMatrix
+without making a dictionary for every player
+"""
+class PlayerColumns:
+    def __init__(self, names, teams, positions, ages, games_played, min_played, stat_names, stats, text_columns=None):
+        self.names = names
+        self.teams = teams
+        self.positions = positions
+        self.ages = ages
+        self.games_played = games_played
+        self.min_played = min_played
+        self.stat_names = list(stat_names)
+        self.stats = stats
+        # columns that turned out not to be numbers (kept as lists of strings)
+        self.text_columns = text_columns or {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def select(self, mask):
+        # method returns a new PlayerColumns with only the rows where mask is True
+        rows = np.flatnonzero(mask).tolist()
+        return PlayerColumns(
+            [self.names[i] for i in rows],
+            [self.teams[i] for i in rows],
+            [self.positions[i] for i in rows],
+            self.ages[mask], self.games_played[mask], self.min_played[mask],
+            self.stat_names, self.stats[mask],
+            {name: [values[i] for i in rows] for name, values in self.text_columns.items()}
+        )
+
+    def iter_players(self, stats=True):
+        # method makes a Player object for every row (stats=False leaves the stats empty)
+        # the players share one StatMatrix wrapped around the stats array, each one just views its row
+        ages = self.ages.tolist()
+        games = self.games_played.tolist()
+        minutes = self.min_played.tolist()
+        matrix = StatMatrix.from_array(self.stat_names, self.stats) if stats else None
+        for i in range(len(self.names)):
+            player_stats = StatView(matrix, i) if stats else {}
+            yield Player(self.names[i], self.teams[i], self.positions[i], ages[i], games[i], minutes[i], player_stats)
+
+    @staticmethod
+    def concat(chunks):
+        # method joins the chunks from PlayerCsvLoader.iter_chunks into one PlayerColumns
+        chunks = list(chunks)
+        if not chunks:
+            return PlayerColumns([], [], [], np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0), [], np.zeros((0, 0)))
+        text_names = chunks[0].text_columns.keys()
+        return PlayerColumns(
+            [name for chunk in chunks for name in chunk.names],
+            [team for chunk in chunks for team in chunk.teams],
+            [pos for chunk in chunks for pos in chunk.positions],
+            np.concatenate([chunk.ages for chunk in chunks]),
+            np.concatenate([chunk.games_played for chunk in chunks]),
+            np.concatenate([chunk.min_played for chunk in chunks]),
+            chunks[0].stat_names,
+            np.concatenate([chunk.stats for chunk in chunks]),
+            {name: [v for chunk in chunks for v in chunk.text_columns[name]] for name in text_names}
+        )
+
+
+def print_load_error(line_number, message):
+    # default error reporter for PlayerCsvLoader, it prints the problem like read_csv_as_dicts always did
+    print(f"Line {line_number}: {message}")
+
+
+"""
+PlayerCsvLoader streams a player CSV in chunks instead of building a dictionary for
+every row. The column schema is worked out once from the header (which columns are
+player info and which are stats), and each chunk of stats is converted to a float array
+in one go. Stat columns that only hold text in the first chunk are kept as text columns
+instead of being mixed into the stats. Problems are sent to on_error(line_number, message),
+which prints them by default, so a caller can collect them or raise instead
+"""
+class PlayerCsvLoader:
+    def __init__(self, filename, chunk_size: int = 50_000, on_error=None):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.on_error = on_error or print_load_error
+        self.stat_names = None
+        self.text_names = None
+
+    def iter_chunks(self):
+        # method yields one PlayerColumns for every chunk_size rows of the file
+        with open(self.filename, "r", newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            positions = {name: i for i, name in enumerate(header)}
+            info_cols = [positions.get(field) for field in non_stat_fields]
+            stat_cols = [i for i, name in enumerate(header) if name not in non_stat_fields]
+            width = len(header)
+            rows = []
+            line_numbers = []
+            for row in reader:
+                if not row:
+                    # blank lines are skipped without a word, like csv.DictReader does
+                    continue
+                if len(row) != width:
+                    # short rows are padded with blanks (blank stats count as 0) and extra cells dropped
+                    row = (row + [""] * width)[:width]
+                rows.append(row)
+                line_numbers.append(reader.line_num)
+                if len(rows) == self.chunk_size:
+                    yield self._parse_chunk(rows, line_numbers, header, info_cols, stat_cols)
+                    rows, line_numbers = [], []
+            if rows:
+                yield self._parse_chunk(rows, line_numbers, header, info_cols, stat_cols)
+
+    def _parse_chunk(self, rows, line_numbers, header, info_cols, stat_cols):
+        # method turns a chunk of raw CSV rows into a PlayerColumns, skipping rows with bad player info
+        if self.text_names is None:
+            self._infer_schema(rows, header, stat_cols)
+        numeric_cols = [i for i in stat_cols if header[i] not in self.text_names]
+        text_cols = [i for i in stat_cols if header[i] in self.text_names]
+        name_col, team_col, pos_col, age_col, games_col, mp_col = info_cols
+        names, teams, positions, ages, games, minutes, good_rows, good_lines = [], [], [], [], [], [], [], []
+        for row, line_number in zip(rows, line_numbers):
+            try:
+                age = int(row[age_col]) if age_col is not None else 0
+                games_played = int(row[games_col]) if games_col is not None else 0
+                min_played = float(row[mp_col]) if mp_col is not None else 0.0
+            except ValueError as e:
+                self.on_error(line_number, f"Skipping row due to error: {e}")
+                continue
+            good_rows.append(row)
+            good_lines.append(line_number)
+            names.append(row[name_col] if name_col is not None else None)
+            teams.append(row[team_col] if team_col is not None else "")
+            positions.append(row[pos_col] if pos_col is not None else "")
+            ages.append(age)
+            games.append(games_played)
+            minutes.append(min_played)
+        text_columns = {header[i]: [row[i] for row in good_rows] for i in text_cols}
+        # all the stat cells of the chunk are converted in one flat pass (blank stats count as 0
+        # like they always have). Only if that fails is it redone cell by cell to find the bad ones
+        flat = [row[i] for row in good_rows for i in numeric_cols]
+        try:
+            stats = np.array([float(cell) if cell != "" else 0.0 for cell in flat])
+        except ValueError:
+            stats = np.array([_to_float(cell) for cell in flat])
+            for bad in np.flatnonzero(np.isnan(stats)).tolist():
+                row, col = divmod(bad, len(numeric_cols))
+                if flat[bad].lower() != "nan":
+                    self.on_error(good_lines[row], f"'{flat[bad]}' in column {header[numeric_cols[col]]} is not a number, stored as NaN")
+        stats = stats.reshape(len(good_rows), len(numeric_cols))
+        return PlayerColumns(names, teams, positions, np.array(ages, dtype=int), np.array(games, dtype=int),
+                             np.array(minutes, dtype=float), self.stat_names, stats, text_columns)
+
+    def _infer_schema(self, rows, header, stat_cols):
+        # the schema is decided once, from the first chunk: a stat column where none of the
+        # filled in cells are numbers is treated as a text column
+        self.text_names = []
+        for i in stat_cols:
+            filled = [row[i] for row in rows if row[i] != ""]
+            if filled and not any(cell.lower() == "nan" or not np.isnan(_to_float(cell)) for cell in filled):
+                self.text_names.append(header[i])
+        self.stat_names = [header[i] for i in stat_cols if header[i] not in self.text_names]
+
+    def iter_players(self):
+        # method streams Player objects without loading the whole file first
+        for chunk in self.iter_chunks():
+            yield from chunk.iter_players()
+
+    def load(self):
+        # method loads the whole file into one PlayerColumns
+        return PlayerColumns.concat(self.iter_chunks())
+
+
+# bump this when the snapshot layout or what parsing produces changes so old snapshots get rebuilt
+# (2: blank lines are skipped instead of becoming rows)
+snapshot_format = 2
+
+
+def _file_sha256(filename):
+    # function hashes a file in 1 MB blocks so big files don't have to fit in memory
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_snapshot(columns, snapshot_path, source_filename, source_sha256=None):
+    """
+    This function writes a PlayerColumns to a binary .npz snapshot: the number columns are
+    saved as arrays and the names/teams/positions as string tables, along with the size,
+    modification time and hash of the source CSV so load_snapshot can tell if it's stale.
+    The file is written to a temporary name first so a crash can't leave half a snapshot.
+    source_sha256 skips hashing the CSV when the caller just did
+    """
+    stat = os.stat(source_filename)
+    arrays = {
+        "format": np.array(snapshot_format),
+        "source_size": np.array(stat.st_size),
+        "source_mtime": np.array(stat.st_mtime_ns),
+        "source_sha256": np.array(source_sha256 or _file_sha256(source_filename)),
+        "names": np.array(columns.names, dtype=str),
+        "teams": np.array(columns.teams, dtype=str),
+        "positions": np.array(columns.positions, dtype=str),
+        "ages": columns.ages,
+        "games_played": columns.games_played,
+        "min_played": columns.min_played,
+        "stat_names": np.array(columns.stat_names, dtype=str),
+        "stats": columns.stats,
+        "text_names": np.array(list(columns.text_columns), dtype=str)
+    }
+    for i, values in enumerate(columns.text_columns.values()):
+        arrays[f"text_{i}"] = np.array(values, dtype=str)
+    temp_path = f"{snapshot_path}.tmp"
+    with open(temp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(temp_path, snapshot_path)
+
+
+def load_snapshot(snapshot_path, source_filename):
+    """
+    This function loads a snapshot written by save_snapshot, or returns None if there isn't one
+    or the source CSV changed. If the size and modification time still match the snapshot is
+    used right away. If only the modification time changed (the file was touched or copied)
+    the CSV is hashed, and the snapshot is still used when the hash matches. It's then written
+    again with the new modification time, so the next load doesn't have to hash the CSV again
+    """
+    try:
+        snapshot = np.load(snapshot_path, allow_pickle=False)
+    except (OSError, ValueError):
+        return None
+    with snapshot:
+        stat = os.stat(source_filename)
+        if int(snapshot["format"]) != snapshot_format or int(snapshot["source_size"]) != stat.st_size:
+            return None
+        restamp = None
+        if int(snapshot["source_mtime"]) != stat.st_mtime_ns:
+            restamp = _file_sha256(source_filename)
+            if str(snapshot["source_sha256"]) != restamp:
+                return None
+        text_names = snapshot["text_names"].tolist()
+        columns = PlayerColumns(
+            snapshot["names"].tolist(),
+            snapshot["teams"].tolist(),
+            snapshot["positions"].tolist(),
+            snapshot["ages"], snapshot["games_played"], snapshot["min_played"],
+            snapshot["stat_names"].tolist(), snapshot["stats"],
+            {name: snapshot[f"text_{i}"].tolist() for i, name in enumerate(text_names)}
+        )
+    if restamp is not None:
+        try:
+            save_snapshot(columns, snapshot_path, source_filename, restamp)
+        except OSError:
+            # the snapshot still works, the next load just hashes the CSV again
+            pass
+    return columns
+
+
+@instrumented("load_player_columns", lambda result, arguments: len(result))
+def load_player_columns(filename, use_cache=True, snapshot_path=None, on_error=None):
+    """
+    This function loads a player CSV as PlayerColumns. With use_cache the parsed data is
+    kept in a binary snapshot next to the CSV (filename + ".snapshot.npz"), so later runs
+    skip the text parsing completely as long as the CSV hasn't changed
+    """
+    snapshot_path = snapshot_path or f"{filename}.snapshot.npz"
+    if use_cache:
+        columns = load_snapshot(snapshot_path, filename)
+        if columns is not None:
+            return columns
+    columns = PlayerCsvLoader(filename, on_error=on_error).load()
+    if use_cache:
+        try:
+            save_snapshot(columns, snapshot_path, filename)
+        except OSError as e:
+            print(f"Could not write snapshot {snapshot_path}: {e}")
+    return columns
+
+
+@instrumented("read_csv_as_dicts", lambda result, arguments: len(result))
+def read_csv_as_dicts(filename, use_cache=False, on_error=None):
     """
     This function is what get's the data from the orginal player CSV
     It also initalizes a list of player objects in the format
     that the player class attributes were
     it later will be transfered into the ranking_system class for filtering
-    and ranking
+    and ranking. The file is read by PlayerCsvLoader, which parses the stats in chunks,
+    and with use_cache the parsed data comes from the binary snapshot when it's up to date.
+    Bad rows are sent to on_error(line_number, message), which prints them by default
     """
-    players = []
     try: 
-        with open(filename, "r", newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                try: 
-                    name = row.get("Player")
-                    team = row.get("Team", "")
-                    position = row.get("Pos", "")
-                    age = int(row.get("Age", 0))
-                    games_played = int(row.get("G", 0))
-                    min_played = float(row.get("MP", 0))
-                    non_stat_fields = {"Player", "Team", "Pos", "Age", "G", "MP"}    
-                    stats = {}
-                    for key, value in row.items():
-                        if key not in non_stat_fields:
-                            try:
-                                stats[key] = float(value) if value != "" else 0
-                            except ValueError:
-                                stats[key] = value
-                    player = Player(name, team, position, age, games_played, min_played, stats)
-                    players.append(player)
-                except Exception as e:
-                    print(f"Skipping row due to error: {e}")
+        if use_cache:
+            return list(load_player_columns(filename, on_error=on_error).iter_players())
+        return list(PlayerCsvLoader(filename, on_error=on_error).iter_players())
     except FileNotFoundError:
         print(f"File {filename} not found")
     except IOError as e: 
         print(f"Error opening file {filename}: {e}")
-            
-    return players
+    return []
+
+# box score stats of one game that a GameLog adds up over its windows
+game_log_stats = ("GS", "MP", "FG", "FGA", "3P", "3PA", "FT", "FTA", "ORB", "DRB", "TRB", "AST", "STL", "BLK",
+                  "TOV", "PF", "PTS")
+# stats a window turns into per game averages, the same keys as the season sheet
+game_log_averages = ("FG", "FGA", "3P", "3PA", "FT", "FTA", "ORB", "DRB", "TRB", "AST", "STL", "BLK", "TOV", "PF",
+                     "PTS")
+# shooting percentages, worked out from the window's totals: name -> (made, attempted)
+game_log_percentages = {"FG%": ("FG", "FGA"), "3P%": ("3P", "3PA"), "2P%": ("2P", "2PA"), "FT%": ("FT", "FTA")}
+
+
+def game_minutes(value):
+    # function reads the minutes of one game, as a number or "mm:ss" like box scores write them
+    if isinstance(value, str) and ":" in value:
+        minutes, _, seconds = value.partition(":")
+        return _to_float(minutes) + _to_float(seconds) / 60
+    return _to_float(value)
+
+
+"""
+GameLog ranks players on their last few games instead of the season totals. Game rows
+(Player, Team, Pos, Age and the game_log_stats) are added in batches as they come in,
+oldest first. Each player's last max(windows) games are kept in a ring buffer, with a
+running total per window: a new game is added to every total and the game that just fell
+out of each window is taken off, so a batch only touches the players who played in it.
+Every window has its own RankingSystem whose players have the window's per game averages
+under the same stat keys as the season sheet (G is the games in the window and MP the
+average minutes). Only the changed stats of the players in the batch are written to the
+matrix, so the normalization is updated from the change log like any other change, and the
+scenario cache is refreshed on the next ranking. A player joins a window's ranking once
+they've played min_games games (the whole window by default). Rows without a player or with
+an Age that isn't a number are skipped and sent to on_error(line_number, message) like
+PlayerCsvLoader does
+"""
+class GameLog:
+    def __init__(self, windows=(5, 10, 20), min_games=None, normalizer="minmax", capacity: int = 64,
+                 on_error=None):
+        self.windows = tuple(sorted(set(windows)))
+        if not self.windows or self.windows[0] < 1:
+            raise ValueError("windows have to be whole numbers of games, 1 or more")
+        self.min_games = min_games
+        self.on_error = on_error or print_load_error
+        self.ranking_systems = {window: RankingSystem(min_games_played=0, min_minutes_played=0, normalizer=normalizer)
+                                for window in self.windows}
+        size = self.windows[-1]
+        # the player number of each name, and each player's info, games and running totals
+        self._player_of = {}
+        self._info = []
+        self._games = np.zeros((capacity, size, len(game_log_stats)))
+        self._played = np.zeros(capacity, dtype=np.int64)
+        self._totals = {window: np.zeros((capacity, len(game_log_stats))) for window in self.windows}
+        # the Player in each window's RankingSystem, by player number
+        self._window_players = {window: {} for window in self.windows}
+        # how far read_new_games got into each file, as filename: (byte offset, header, lines read)
+        self._offsets = {}
+
+    def __len__(self):
+        return len(self._info)
+
+    def _grow(self, min_players):
+        # method makes room for more players in the game buffers and window totals
+        capacity = max(min_players, 2 * len(self._played))
+        self._games = np.concatenate([self._games, np.zeros((capacity - len(self._played),) + self._games.shape[1:])])
+        for window, totals in self._totals.items():
+            self._totals[window] = np.concatenate([totals, np.zeros((capacity - len(totals), totals.shape[1]))])
+        self._played = np.concatenate([self._played, np.zeros(capacity - len(self._played), dtype=np.int64)])
+
+    def _player_numbers(self, rows):
+        # method finds the player number of every row, giving new players the next numbers
+        numbers = []
+        for row in rows:
+            name = row["Player"]
+            number = self._player_of.get(name)
+            if number is None:
+                number = self._player_of[name] = len(self._info)
+                self._info.append({"Player": name, "Team": "", "Pos": "", "Age": 0})
+            # team and position follow the player's latest game (a traded player moves team)
+            info = self._info[number]
+            info.update({field: row[field] for field in ("Team", "Pos") if row.get(field)})
+            if row.get("Age"):
+                info["Age"] = int(float(row["Age"]))
+            numbers.append(number)
+        if len(self._info) > len(self._played):
+            self._grow(len(self._info))
+        return np.array(numbers, dtype=np.int64)
+
+    @staticmethod
+    def _game_values(rows):
+        # method turns the rows into a (games x game_log_stats) array, TRB is ORB + DRB when it's missing
+        values = np.array([[game_minutes(row.get(stat, "")) if stat == "MP" else _to_float(row.get(stat, ""))
+                            for stat in game_log_stats] for row in rows], dtype=float).reshape(len(rows), -1)
+        trb, orb, drb = (game_log_stats.index(stat) for stat in ("TRB", "ORB", "DRB"))
+        missing = np.array([row.get("TRB", "") in ("", None) for row in rows], dtype=bool)
+        values[missing, trb] = values[missing, orb] + values[missing, drb]
+        return values
+
+    @staticmethod
+    def _row_problem(row):
+        # method says why a game row can't be added, or None when it can
+        if not row.get("Player"):
+            return "the row has no Player"
+        if row.get("Age") and not np.isfinite(_to_float(row["Age"])):
+            return f"Age '{row['Age']}' is not a number"
+        return None
+
+    @instrumented("game_log", lambda result, arguments: result)
+    def add_games(self, rows, line_numbers=None):
+        """
+        This method adds a batch of game rows (dictionaries keyed like the CSV header, oldest
+        game first) and updates every window of the players in it. A player with several
+        games in the batch has them added one round at a time, every round being one array
+        operation over the players in it. A skipped row is reported with its line number from
+        line_numbers, or its place in the batch (from 1). It returns the number of rows it read
+        """
+        rows = list(rows)
+        read = len(rows)
+        good = []
+        for row, line_number in zip(rows, line_numbers or range(1, read + 1)):
+            problem = self._row_problem(row)
+            if problem is None:
+                good.append(row)
+            else:
+                self.on_error(line_number, f"Skipping row due to error: {problem}")
+        rows = good
+        if not rows:
+            return read
+        numbers = self._player_numbers(rows)
+        values = self._game_values(rows)
+        size = self.windows[-1]
+        # the round of each row is how many earlier rows in the batch are the same player's
+        seen = {}
+        rounds = np.zeros(len(numbers), dtype=np.int64)
+        for i, number in enumerate(numbers.tolist()):
+            rounds[i] = seen[number] = seen.get(number, -1) + 1
+        for game_round in range(int(rounds.max()) + 1):
+            in_round = rounds == game_round
+            players, games = numbers[in_round], values[in_round]
+            played = self._played[players]
+            for window, totals in self._totals.items():
+                # the game leaving the window is read before its ring slot is overwritten
+                leaving = self._games[players, (played - window) % size] * (played >= window)[:, None]
+                totals[players] += games - leaving
+            self._games[players, played % size] = games
+            self._played[players] = played + 1
+        changed = np.unique(numbers)
+        for window in self.windows:
+            self._update_window(window, changed)
+        return read
+
+    def window_stats(self, window, players):
+        # method returns (stat names, players x stats array) of the window's per game averages
+        games = np.minimum(self._played[players], window).astype(float)[:, None]
+        totals = self._totals[window][players]
+        column = {stat: totals[:, i] for i, stat in enumerate(game_log_stats)}
+        column["2P"] = column["FG"] - column["3P"]
+        column["2PA"] = column["FGA"] - column["3PA"]
+        names = ["GS"] + list(game_log_averages) + ["2P", "2PA"]
+        averages = np.column_stack([column[stat] for stat in names])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            averages[:, 1:] /= games
+            made = totals[:, game_log_stats.index("FG")] + 0.5 * totals[:, game_log_stats.index("3P")]
+            percentages = [column[made_stat] / column[attempts] for made_stat, attempts in game_log_percentages.values()]
+            percentages.append(made / column["FGA"])
+        return names + list(game_log_percentages) + ["eFG%"], np.column_stack([averages] + percentages)
+
+    def _update_window(self, window, players):
+        ranking_system = self.ranking_systems[window]
+        window_players = self._window_players[window]
+        min_games = min(window, self.min_games or window)
+        players = players[self._played[players] >= min_games]
+        if not len(players):
+            return
+        names, stats = self.window_stats(window, players)
+        games = np.minimum(self._played[players], window)
+        minutes = self._totals[window][players, game_log_stats.index("MP")] / games
+        updated, updated_stats = [], []
+        for number, stat_values, g, mp in zip(players.tolist(), stats, games.tolist(), minutes.tolist()):
+            info = self._info[number]
+            player = window_players.get(number)
+            if player is None:
+                player = Player(info["Player"], info["Team"], info["Pos"], info["Age"], g, mp,
+                                dict(zip(names, stat_values.tolist())))
+                ranking_system.add_player(player)
+                window_players[number] = player
+                continue
+            player.team, player.position, player.age = info["Team"], info["Pos"], info["Age"]
+            player.games_played, player.min_played = g, mp
+            updated.append(player)
+            updated_stats.append(stat_values)
+        if updated:
+            ranking_system.update_players(updated, names, np.array(updated_stats))
+
+    def rank(self, weights, window=10, top_n=10, filters=None, normalize="pool"):
+        # method returns the top_n (player, score) pairs over the players' last window games
+        if window not in self.ranking_systems:
+            raise ValueError(f"no {window} game window, choose from {list(self.windows)}")
+        return self.ranking_systems[window].rank(weights, top_n, filters, normalize)
+
+    def read_new_games(self, filename, batch_size: int = 5_000):
+        """
+        This method reads the rows added to a game log CSV since the last call (the file is
+        only ever appended to) and adds them in batches, reading the file a line at a time from
+        where the last call stopped. A line without its newline yet is left for the next call.
+        It returns the number of game rows read (skipped rows included)
+        """
+        offset, header, line_number = self._offsets.get(filename, (0, None, 0))
+        read = 0
+        lines, line_numbers = [], []
+        with open(filename, "rb") as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break
+                offset += len(raw)
+                line_number += 1
+                if header is None:
+                    header = next(csv.reader([raw.decode("utf-8")]), [])
+                else:
+                    lines.append(raw.decode("utf-8"))
+                    line_numbers.append(line_number)
+                if len(lines) == batch_size:
+                    read += self._add_lines(lines, line_numbers, header)
+                    # the offset only moves past lines that have been added
+                    self._offsets[filename] = (offset, header, line_number)
+                    lines, line_numbers = [], []
+        if lines:
+            read += self._add_lines(lines, line_numbers, header)
+        self._offsets[filename] = (offset, header, line_number)
+        return read
+
+    def _add_lines(self, lines, line_numbers, header):
+        # method adds a batch of CSV lines (blank ones are skipped) and returns how many rows it read
+        rows, numbers = [], []
+        for values, line_number in zip(csv.reader(lines), line_numbers):
+            if values:
+                rows.append(dict(zip(header, values)))
+                numbers.append(line_number)
+        return self.add_games(rows, numbers)
+
 
 # these dictionaries below are some of the set stat weights for specific situations
 # I decided on the weighted values based on which stats are important for each situation 
@@ -251,6 +2375,259 @@ best_three_point_scorer = {
 
 }
 
+# all the preset situations by name, used when ranking many situations at once
+preset_scenarios = {
+    "overall": overall,
+    "best_clutch_player": best_clutch_player,
+    "best_defensive_player": best_defensive_player,
+    "best_playmaker": best_playmaker,
+    "best_three_point_scorer": best_three_point_scorer
+}
+
+def _rank_partition_worker(shm_name, shape, stat_names, scenarios, top_n, min_games_played, min_minutes_played):
+    """
+    This function runs in a worker process. It attaches to the shared memory block of one
+    partition (games, minutes and then the stats, one row per player), does the same filtering
+    as add_player, normalizes and scores every scenario, and sends back only the row numbers
+    and scores of the possible top_n players for each scenario (ties at the cutoff included,
+    so the parent can break them by Player.id)
+    """
+    block_memory = shared_memory.SharedMemory(name=shm_name)
+    try:
+        block = np.ndarray(shape, dtype=float, buffer=block_memory.buf)
+        keep = np.flatnonzero((block[:, 0] >= min_games_played) & (block[:, 1] >= min_minutes_played))
+        system = RankingSystem(min_games_played, min_minutes_played)
+        # fancy indexing copies the rows, so nothing points at the shared block after this
+        system.matrix = StatMatrix.from_array(stat_names, block[keep, 2:])
+        del block
+        names, scores = system.score_many(scenarios)
+        results = {}
+        for j, name in enumerate(names):
+            candidates = top_n_candidates(scores[:, j], top_n)
+            results[name] = (keep[candidates], scores[candidates, j])
+        return results
+    finally:
+        block_memory.close()
+
+
+def rank_partitions(partitions: dict, scenarios: dict = None, top_n=10, max_workers=None,
+                    min_games_played: int = 20, min_minutes_played: int = 15):
+    """
+    This function ranks many partitions (seasons, leagues, ...) in parallel. partitions maps
+    a partition name to its PlayerColumns. Each partition's numbers are copied once into a
+    shared memory block, so the worker processes get them without pickling any Player objects,
+    and each worker normalizes and scores its partition for every scenario like rank_many.
+    It returns (by_partition, merged): by_partition[partition][scenario] is that partition's
+    top_n and merged[scenario] is the top_n over all the partitions. Each entry is a dictionary
+    with the partition, player info and score
+    """
+    scenarios = scenarios if scenarios is not None else preset_scenarios
+    blocks = {}
+    try:
+        for part_name, columns in partitions.items():
+            shape = (len(columns), len(columns.stat_names) + 2)
+            block_memory = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1] * 8))
+            block = np.ndarray(shape, dtype=float, buffer=block_memory.buf)
+            block[:, 0] = columns.games_played
+            block[:, 1] = columns.min_played
+            block[:, 2:] = columns.stats
+            del block
+            blocks[part_name] = (block_memory, shape)
+
+        args = [(blocks[name][0].name, blocks[name][1], partitions[name].stat_names, scenarios, top_n,
+                 min_games_played, min_minutes_played) for name in partitions]
+        if max_workers == 1:
+            # no pool for a single worker, this is also the easiest way to debug a partition
+            raw_results = [_rank_partition_worker(*arg) for arg in args]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                raw_results = list(pool.map(_rank_partition_worker, *zip(*args))) if args else []
+    finally:
+        for block_memory, shape in blocks.values():
+            block_memory.close()
+            block_memory.unlink()
+
+    by_partition = {}
+    merged = {scenario: [] for scenario in scenarios}
+    for part_name, results in zip(partitions, raw_results):
+        columns = partitions[part_name]
+        by_partition[part_name] = {}
+        for scenario, (rows, scores) in results.items():
+            entries = [{"Partition": part_name, "ID": f"{columns.names[row]}_{columns.teams[row]}",
+                        "Player": columns.names[row], "Team": columns.teams[row], "Pos": columns.positions[row],
+                        "Score": score} for row, score in zip(rows.tolist(), scores.tolist())]
+            entries.sort(key=lambda entry: (-entry["Score"], entry["ID"]))
+            by_partition[part_name][scenario] = entries[:top_n]
+            merged[scenario].extend(entries[:top_n])
+    for scenario, entries in merged.items():
+        entries.sort(key=lambda entry: (-entry["Score"], entry["ID"], entry["Partition"]))
+        merged[scenario] = entries[:top_n]
+    return by_partition, merged
+
+
+def sample_weight_vectors(base_weights: dict, ranges: dict, samples=1000, seed=None):
+    """
+    This function makes samples perturbed copies of base_weights as one matrix. ranges maps
+    a stat to how far its weight may move from the base weight, either a number (plus or
+    minus that much) or a (low, high) pair of offsets, and every offset is drawn uniformly.
+    Stats not in ranges keep their base weight and stats only in ranges start from 0.
+    It returns the stat names and a (stats x samples) weight matrix, one column per vector
+    """
+    stat_names = list(base_weights) + [stat for stat in ranges if stat not in base_weights]
+    rng = np.random.default_rng(seed)
+    weight_matrix = np.empty((len(stat_names), samples))
+    for i, stat in enumerate(stat_names):
+        spread = ranges.get(stat, 0.0)
+        low, high = (-spread, spread) if isinstance(spread, numbers.Real) else spread
+        if low > high:
+            raise ValueError(f"the range for {stat} goes from {low} down to {high}")
+        weight_matrix[i] = base_weights.get(stat, 0.0) + rng.uniform(low, high, samples)
+    return stat_names, weight_matrix
+
+
+def kendall_tau_columns(base, scores):
+    """
+    This function works out Kendall's tau-b between one base score vector and every column
+    of scores at once (the pairs are compared with sign differences, so no loop per column).
+    1 means the same order as base, -1 the reverse order. A column where every score is
+    equal has no order and gets NaN
+    """
+    first, second = np.triu_indices(len(base), k=1)
+    base_signs = np.sign(base[first] - base[second])
+    signs = np.sign(scores[first] - scores[second])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (base_signs[:, None] * signs).sum(axis=0) / np.sqrt(
+            np.count_nonzero(base_signs) * np.count_nonzero(signs, axis=0))
+
+
+"""
+SweepResult holds what a weight sweep found. For every sampled weight vector it keeps
+the Kendall tau between the base top_n order and the order those same players get under
+the vector, and the share of the base top_n still in the vector's top_n. For every player
+it keeps how many vectors had them in the top_n
+"""
+class SweepResult:
+    def __init__(self, players, stat_names, weight_matrix, base_top, tau, overlap, top_counts):
+        self.players = players
+        self.stat_names = stat_names
+        self.weight_matrix = weight_matrix
+        self.base_top = base_top
+        self.tau = tau
+        self.overlap = overlap
+        self.top_counts = top_counts
+
+    def __len__(self):
+        return self.weight_matrix.shape[1]
+
+    def weights(self, i):
+        # method returns sample i as a weight dictionary
+        return dict(zip(self.stat_names, self.weight_matrix[:, i].tolist()))
+
+    def top_frequency(self, limit=None):
+        # method returns (player, share of vectors with the player in the top_n), most often first
+        rows = np.flatnonzero(self.top_counts)
+        rows = rows[np.lexsort((rows, -self.top_counts[rows]))][:limit]
+        return [(self.players[row], float(self.top_counts[row]) / len(self)) for row in rows.tolist()]
+
+    def summary(self):
+        # method returns the headline numbers of the sweep
+        # NaN is left for a vector with nothing to compare (an empty pool or all equal scores)
+        tau = self.tau[~np.isnan(self.tau)]
+        overlap = self.overlap[~np.isnan(self.overlap)]
+        nan = float("nan")
+        return {
+            "samples": len(self),
+            "top_n": len(self.base_top),
+            "mean_tau": float(tau.mean()) if len(tau) else nan,
+            "p5_tau": float(np.percentile(tau, 5)) if len(tau) else nan,
+            "min_tau": float(tau.min()) if len(tau) else nan,
+            "mean_overlap": float(overlap.mean()) if len(overlap) else nan,
+            "base_top_kept": float((overlap == 1).mean()) if len(overlap) else nan
+        }
+
+
+# distances the similarity search supports
+similarity_metrics = ("cosine", "euclidean")
+
+
+"""
+SimilarityIndex finds the nearest neighbors of players by their stat vectors (one row per
+player). It's an exact search done as blocked brute force: a block of query rows times all
+the vectors is one BLAS matrix multiply, and the k best of every row come from np.argpartition.
+cosine ranks by cosine similarity (higher is more alike), euclidean by euclidean distance
+(lower is more alike). The vectors can be scaled per stat beforehand, which turns euclidean
+into a weighted euclidean distance. Only block_rows x players scores exist at a time, so the
+all pairs table never needs a players x players matrix
+"""
+class SimilarityIndex:
+    def __init__(self, vectors, metric="cosine", memory_budget_mb=64):
+        if metric not in similarity_metrics:
+            raise ValueError(f"unknown metric {metric!r}, choose from {list(similarity_metrics)}")
+        vectors = np.array(vectors, dtype=float)
+        if metric == "cosine":
+            # unit length rows make the dot product the cosine similarity (all zero rows stay zero)
+            lengths = np.linalg.norm(vectors, axis=1)[:, None]
+            vectors = np.divide(vectors, lengths, out=np.zeros_like(vectors), where=lengths > 0)
+        self.metric = metric
+        self.vectors = vectors
+        self.squared = np.einsum("ij,ij->i", vectors, vectors)
+        self.memory_budget_mb = memory_budget_mb
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _scores(self, start, stop):
+        # higher is more alike for both metrics: the cosine similarity or minus the squared distance
+        dots = self.vectors[start:stop] @ self.vectors.T
+        if self.metric == "cosine":
+            return dots
+        return 2 * dots - self.squared[start:stop, None] - self.squared[None, :]
+
+    def _values(self, scores):
+        # turns scores back into what the metric reports
+        if self.metric == "cosine":
+            return scores
+        return np.sqrt(np.maximum(-scores, 0.0))
+
+    def neighbors(self, row, k=20):
+        # method returns the rows of the k players most like row (itself left out) and their similarity/distance
+        scores = self._scores(row, row + 1)[0]
+        scores[row] = -np.inf
+        order = np.array(top_n_indices(scores, min(k, len(scores) - 1), lambda i: i), dtype=int)
+        return order, self._values(scores[order])
+
+    def all_pairs(self, k=10):
+        """
+        This method yields (first row, neighbor rows, values) for one block of players at a time,
+        where neighbor rows and values are (block x k) arrays of every player's k nearest
+        neighbors, best first. Ties at the k-th neighbor are decided arbitrarily
+        """
+        n = len(self.vectors)
+        k = min(k, n - 1)
+        # the score block and the argpartition indices are both block x n
+        block = max(1, int(self.memory_budget_mb * 1e6 // (16 * max(n, 1))))
+        for start in range(0, n if k > 0 else 0, block):
+            stop = min(start + block, n)
+            scores = self._scores(start, stop)
+            scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+            top = np.argpartition(scores, n - k, axis=1)[:, n - k:]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.lexsort((top, -top_scores), axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            yield start, top, self._values(np.take_along_axis(top_scores, order, axis=1))
+
+    def table(self, k=10):
+        # method returns the full (players x k) neighbor rows and values, built a block at a time
+        n = len(self.vectors)
+        k = max(0, min(k, n - 1))
+        rows = np.zeros((n, k), dtype=int)
+        values = np.zeros((n, k))
+        for start, top, top_values in self.all_pairs(k):
+            rows[start:start + len(top)] = top
+            values[start:start + len(top)] = top_values
+        return rows, values
+
+
 def create_custom_weights():
     #This function allows the user to create their own unique situation and custom weights
     stats = ["FGA", "FG%", "3P", "3PA", "3P%", "2P", "2PA", "2P%", "eFG%", 
@@ -280,32 +2657,38 @@ def create_custom_weights():
     return weights 
 
 
-def compare_players(p1, p2, weights, scenario_name="Custom"):
+def weighted_breakdown(player, weights):
     """
-    Compares two players using normalized and weighted stats
-    and prints a clear, easy-to-read comparison.
+    This function works out the normalized and weighted value of every weighted stat
+    for one player, and the total score, without changing the player. It returns
+    ({stat: {"Normalized": ..., "Weighted": ...}}, total score)
     """
+    results = {}
+    total_score = 0
 
-    def calculate_weighted(player):
-        results = {}
-        total_score = 0
+    for stat in weights:
+        norm_val = player.norm_stats.get(stat, 0)
+        weighted_val = norm_val * weights[stat]
 
-        for stat in weights:
-            norm_val = player.norm_stats.get(stat, 0)
-            weighted_val = norm_val * weights[stat]
+        results[stat] = {
+            "Normalized": norm_val,
+            "Weighted": weighted_val
+        }
 
-            results[stat] = {
-                "Normalized": norm_val,
-                "Weighted": weighted_val
-            }
+        total_score += weighted_val
+    return results, total_score
 
-            total_score += weighted_val
 
-        player.score = total_score
-        return results
+def compare_players(p1, p2, weights, scenario_name="Custom", breakdowns=None):
+    """
+    Compares two players using normalized and weighted stats
+    and prints a clear, easy-to-read comparison.
+    breakdowns can pass in the weighted_breakdown of both players when the caller already has them
+    """
 
-    p1_stats = calculate_weighted(p1)
-    p2_stats = calculate_weighted(p2)
+    # the scores are kept here instead of being written onto the players
+    (p1_stats, p1_score), (p2_stats, p2_score) = breakdowns or (weighted_breakdown(p1, weights),
+                                                                 weighted_breakdown(p2, weights))
 
     print("\n==============================")
     print("Player Comparison")
@@ -328,19 +2711,22 @@ def compare_players(p1, p2, weights, scenario_name="Custom"):
               round(p1_weighted - p2_weighted, 3))
 
     print("\nFinal Scores:")
-    print(p1.name, "Score:", round(p1.score, 3))
-    print(p2.name, "Score:", round(p2.score, 3))
+    print(p1.name, "Score:", round(p1_score, 3))
+    print(p2.name, "Score:", round(p2_score, 3))
 
-    if p1.score > p2.score:
+    if p1_score > p2_score:
         print("Better player for this situation:", p1.name)
-    elif p2.score > p1.score:
+    elif p2_score > p1_score:
         print("Better player for this situation:", p2.name)
     else:
         print("Both players are equal for this situation.")
 
-    return sorted([p1, p2], key=lambda x: x.score, reverse=True)
+    # best player first, the scores themselves come from weighted_breakdown
+    scores = {id(p1): p1_score, id(p2): p2_score}
+    return sorted([p1, p2], key=lambda x: scores[id(x)], reverse=True)
 
 
+@instrumented("export_rankings_to_csv", lambda result, arguments: len(arguments["players"]))
 def export_rankings_to_csv(players, filename):
     """
     This function exports the sorted players by score into a
@@ -349,42 +2735,167 @@ def export_rankings_to_csv(players, filename):
     if not players:
         print("No players to export.")
         return
-    stat_keys = list(players[0].stats.keys())
-    headers = ["Player", "Team", "Pos", "Age", "G", "MP", "Score"] + stat_keys 
     try:
         with open(filename, "w", newline="", encoding="utf-8") as f: 
-            writer = csv.writer(f)
-            writer.writerow(headers)
-
-            for p in players:
-                row = [
-                    p.name,
-                    p.team,
-                    p.position,
-                    p.age, 
-                    p.games_played,
-                    p.min_played,
-                    round(p.score, 4)
-
-                ] + [p.stats[k] for k in stat_keys]
-
-                writer.writerow(row)
+            write_rankings_csv(players, f)
     except Exception:
         print(f"Error occurred when opening {filename} to write")
     print(f"Exported full rankings to {filename}") 
 
+def write_rankings_csv(players, f, scores=None):
+    # function writes the ranking CSV rows to an open file (scores can be given instead of using p.score)
+    stat_keys = list(players[0].stats.keys())
+    headers = ["Player", "Team", "Pos", "Age", "G", "MP", "Score"] + stat_keys 
+    writer = csv.writer(f)
+    writer.writerow(headers)
+
+    for i, p in enumerate(players):
+        stats = p.stats
+        row = [
+            p.name,
+            p.team,
+            p.position,
+            p.age, 
+            p.games_played,
+            p.min_played,
+            round(p.score if scores is None else scores[i], 4)
+
+        ] + [stats.get(k, np.nan) for k in stat_keys]
+
+        writer.writerow(row)
+
 def export_top_n_to_csv(players, filename, top_n=20):
     # this function specifically exports the top players into the csv
-    sorted_players = sorted(players, key=lambda p: p.score, reverse=True)
-    top_players = sorted_players[:top_n]
+    top_players = select_top_players(players, top_n)
     export_rankings_to_csv(top_players, filename)
 
 
+# formats the bulk export can write and their file extensions
+export_formats = {"csv": ".csv", "parquet": ".parquet", "ndjson": ".ndjson"}
+ranking_headers = ["Player", "Team", "Pos", "Age", "G", "MP", "Score"]
+
+
+def ranking_columns(ranking_system, result, rows):
+    """
+    This function gathers what a ranking file needs for the given player rows straight from
+    the arrays: the player info and rounded scores as lists (one per column) and the raw stats
+    as one (rows x stats) block sliced out of the StatMatrix, so no p.stats lookup per cell.
+    It returns the headers, the info columns and the stats block
+    """
+    # a filtered result's positions are turned into RankingSystem rows
+    matrix_rows = rows if result.rows is None else result.rows[np.asarray(rows, dtype=np.int64)].tolist()
+    players = [ranking_system.players[i] for i in matrix_rows]
+    info = [
+        [p.name for p in players],
+        [p.team for p in players],
+        [p.position for p in players],
+        [p.age for p in players],
+        [p.games_played for p in players],
+        [p.min_played for p in players],
+        [round(score, 4) for score in result.scores[rows].tolist()]
+    ]
+    matrix = ranking_system.matrix
+    return ranking_headers + matrix.stat_names, info, matrix.values[matrix_rows]
+
+
+def write_ranking(f, ranking_system, result, rows, fmt="csv", chunk_size=50_000):
+    """
+    This function writes the given player rows of a ScoreResult to an open text file as
+    CSV or newline delimited JSON. Each chunk of rows is formatted into a buffer and
+    written with a single f.write
+    """
+    headers, info, stats = ranking_columns(ranking_system, result, rows)
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(headers)
+        f.write(buffer.getvalue())
+    for start in range(0, len(rows), chunk_size):
+        stop = start + chunk_size
+        lines = (list(row) + values for row, values in zip(zip(*(column[start:stop] for column in info)),
+                                                            stats[start:stop].tolist()))
+        buffer = io.StringIO()
+        if fmt == "csv":
+            csv.writer(buffer).writerows(lines)
+        elif fmt == "ndjson":
+            for line in lines:
+                # NaN isn't valid JSON, a missing stat becomes null
+                record = {key: None if value != value else value for key, value in zip(headers, line)}
+                buffer.write(json.dumps(record, ensure_ascii=False))
+                buffer.write("\n")
+        else:
+            raise ValueError(f"{fmt} can't be written to a text file, choose csv or ndjson")
+        f.write(buffer.getvalue())
+
+
+def write_ranking_parquet(path, ranking_system, result, rows):
+    # function writes the given player rows of a ScoreResult to a Parquet file (needs pyarrow)
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow") from None
+    headers, info, stats = ranking_columns(ranking_system, result, rows)
+    arrays = [pa.array(column) for column in info] + [pa.array(stats[:, j]) for j in range(stats.shape[1])]
+    pq.write_table(pa.Table.from_arrays(arrays, names=headers), path)
+
+
+def _exported_rows(path, arguments):
+    # rows written by one export_ranking call, for the instrumentation
+    result, top_n = arguments["result"], arguments["top_n"]
+    return len(result.scores) if top_n is None else min(top_n, len(result.scores))
+
+
+@instrumented("export_ranking", _exported_rows)
+def export_ranking(ranking_system, result, path, fmt="csv", top_n=None, chunk_size=50_000):
+    """
+    This function writes one ranking file for a ScoreResult, the top_n players or the whole
+    pool when top_n is None. The order comes from result.top_indices, which keeps the longest
+    order worked out so far, so a top 20 file after a full file reuses the same ranking.
+    It returns the path
+    """
+    if fmt not in export_formats:
+        raise ValueError(f"unknown export format {fmt!r}, choose from {list(export_formats)}")
+    rows = result.top_indices(top_n)
+    if fmt == "parquet":
+        write_ranking_parquet(path, ranking_system, result, rows)
+    else:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            write_ranking(f, ranking_system, result, rows, fmt, chunk_size)
+    return path
+
+
+@instrumented("export_scenarios")
+def export_scenarios(ranking_system, scenarios: dict, prefix="", formats=("csv",), top_n=20, max_workers=None):
+    """
+    This function exports a top_n file and a full file in every format for every scenario,
+    named like prefix + "overall_Top20.csv" and prefix + "overall_Full.csv". Each scenario is
+    scored and fully ranked once, then a thread pool writes the files at the same time.
+    For several seasons call it once per season's RankingSystem with a different prefix.
+    It returns the paths that were written
+    """
+    jobs = []
+    for name, weights in scenarios.items():
+        result = ranking_system.score(weights)
+        # the full order is worked out here so the writer threads only read it
+        result.top_indices(None)
+        for fmt in formats:
+            extension = export_formats[fmt]
+            jobs.append((result, f"{prefix}{name}_Top{top_n}{extension}", fmt, top_n))
+            jobs.append((result, f"{prefix}{name}_Full{extension}", fmt, None))
+    with ThreadPoolExecutor(max_workers) as pool:
+        futures = [pool.submit(export_ranking, ranking_system, result, path, fmt, n) for result, path, fmt, n in jobs]
+        return [future.result() for future in futures]
+
+
+# suffix of the normalized stats in a flat player row, so they don't overwrite the raw stats
+norm_suffix = "_norm"
+
+
 def flatten_player_dicts(player_dicts):
     """
     This function flattens the nested player dictionaries so that plotly
     can use them for plotting. It combines raw stats and normalized stats into 
-    one flat dictionary
+    one flat dictionary (the normalized stats get norm_suffix added to their name)
 
     """
     flat_list = []
@@ -393,12 +2904,150 @@ def flatten_player_dicts(player_dicts):
         stats = flat.pop("Stats", {})
         norms = flat.pop("Norm Stats", {})
         flat.update(stats)
-        flat.update(norms)
+        flat.update((stat + norm_suffix, value) for stat, value in norms.items())
         flat_list.append(flat)
     return flat_list
 
 
-def plot_top_players(players, title=f"Top Players", scenario_name =""):
+def _player_info(p):
+    # the non stat part of a flat player row, same keys and order as Player.to_dict
+    return {"ID": p.id, "Player": p.name, "Age": p.age, "Team": p.team, "Pos": p.position,
+            "G": p.games_played, "MP": p.min_played, "Score": p.score}
+
+
+def iter_flat_players(players, include_norm=True):
+    """
+    This function is the streaming version of flatten_player_dicts(p.to_dict() for p in players).
+    It yields one flat dictionary per player, built straight from the player and its StatMatrix
+    row without the nested dictionary in between, so only one row is in memory at a time
+    """
+    for p in players:
+        flat = _player_info(p)
+        matrix = p._matrix
+        if matrix is not None:
+            flat.update(zip(matrix.stat_names, matrix.values[p._row].tolist()))
+            if include_norm and matrix.has_norm:
+                flat.update(zip((stat + norm_suffix for stat in matrix.stat_names), matrix.norm[p._row].tolist()))
+        else:
+            flat.update(p.stats)
+            if include_norm:
+                flat.update((stat + norm_suffix, value) for stat, value in p.norm_stats.items())
+        yield flat
+
+
+def flat_player_columns(players, include_norm=True):
+    """
+    This function builds the same flat table as iter_flat_players, but as columns (a dictionary
+    of column name to list or array) in one step. When every player is in the same StatMatrix the
+    stats of all of them are sliced out of it as one block instead of being read player by player
+    """
+    infos = [_player_info(p) for p in players]
+    columns = {key: [info[key] for info in infos] for key in (infos[0] if infos else ())}
+    matrix = players[0]._matrix if players else None
+    if matrix is not None and all(p._matrix is matrix for p in players):
+        rows = [p._row for p in players]
+        columns.update(zip(matrix.stat_names, matrix.values[rows].T))
+        if include_norm and matrix.has_norm:
+            columns.update(zip([stat + norm_suffix for stat in matrix.stat_names], matrix.norm[rows].T))
+        return columns
+    stat_names = list(dict.fromkeys(stat for p in players for stat in p.stats))
+    columns.update((stat, [p.stats.get(stat, np.nan) for p in players]) for stat in stat_names)
+    if include_norm:
+        norm_names = list(dict.fromkeys(stat for p in players for stat in p.norm_stats))
+        columns.update((stat + norm_suffix, [p.norm_stats.get(stat, np.nan) for p in players]) for stat in norm_names)
+    return columns
+
+
+def players_to_dataframe(players, include_norm=True):
+    # function makes the flat pandas DataFrame of the players straight from flat_player_columns
+    import pandas as pd
+    return pd.DataFrame(flat_player_columns(players, include_norm))
+
+
+# above this many points a scatter plot is drawn with WebGL (Scattergl) instead of SVG
+webgl_threshold = 5_000
+# ways plot_scatter can count the points into bins instead of drawing every one
+density_modes = ("hist", "hexbin")
+# player fields a plot can use besides the stats
+plot_info_fields = {"Age": "age", "G": "games_played", "MP": "min_played"}
+
+
+def plot_columns(players, fields):
+    """
+    This function returns only the columns a plot needs: the names, the scores and the asked
+    for fields (a stat, a normalized stat with norm_suffix, Age, G or MP) as arrays. When every
+    player is in the same StatMatrix the stats are sliced out of it for all of them at once,
+    so a big pool doesn't go through a full flat DataFrame. Fields nobody has are left out
+    """
+    columns = {"Player": [p.name for p in players]}
+    matrix = players[0]._matrix if players else None
+    shared = matrix is not None and all(p._matrix is matrix for p in players)
+    rows = np.array([p._row for p in players], dtype=np.int64) if shared else None
+    if shared and matrix.scores is not None and len(matrix.scores) > rows.max():
+        columns["Score"] = matrix.scores[rows]
+    else:
+        columns["Score"] = np.array([p.score for p in players], dtype=float)
+    for field in fields:
+        normalized = field.endswith(norm_suffix)
+        stat = field[:-len(norm_suffix)] if normalized else field
+        if field in plot_info_fields:
+            columns[field] = np.array([_to_float(getattr(p, plot_info_fields[field])) for p in players])
+        elif shared and stat in matrix.stat_index:
+            source = matrix.norm if normalized else matrix.values
+            columns[field] = source[rows, matrix.stat_index[stat]]
+        elif not shared and any(stat in (p.norm_stats if normalized else p.stats) for p in players):
+            columns[field] = np.array([(p.norm_stats if normalized else p.stats).get(stat, np.nan) for p in players],
+                                      dtype=float)
+    return columns
+
+
+def plot_fields(players):
+    # function lists the fields plot_scatter can use for these players
+    stat_names = list(dict.fromkeys(stat for p in players[:1000] for stat in p.stats))
+    return ["Score", *plot_info_fields, *stat_names, *(stat + norm_suffix for stat in stat_names)]
+
+
+def hexbin_counts(x, y, gridsize=60):
+    """
+    This function counts points into a grid of hexagons (gridsize across), the way matplotlib's
+    hexbin does: every point goes to the nearer center of two offset rectangular lattices.
+    It returns the centers and counts of the hexagons that have any points
+    """
+    x_min, x_max, y_min, y_max = x.min(), x.max(), y.min(), y.max()
+    rows = max(1, int(round(gridsize / np.sqrt(3))))
+    x_step = (x_max - x_min) / gridsize or 1.0
+    y_step = (y_max - y_min) / rows or 1.0
+    ix, iy = (x - x_min) / x_step, (y - y_min) / y_step
+    ix1, iy1 = np.round(ix), np.round(iy)
+    ix2, iy2 = np.floor(ix) + 0.5, np.floor(iy) + 0.5
+    first = (ix - ix1) ** 2 + 3 * (iy - iy1) ** 2 <= (ix - ix2) ** 2 + 3 * (iy - iy2) ** 2
+    # centers are on a half step grid, so doubled they're whole numbers and make one integer key
+    height = 2 * rows + 3
+    keys = (2 * np.where(first, ix1, ix2)).astype(np.int64) * height + (2 * np.where(first, iy1, iy2)).astype(np.int64)
+    keys, counts = np.unique(keys, return_counts=True)
+    return x_min + keys // height * x_step / 2, y_min + keys % height * y_step / 2, counts
+
+
+def write_figure(fig, output):
+    """
+    This function shows a figure in the browser, or with output writes it to that file instead
+    so plots can be made headless in batch: .html is a standalone page, anything else (.png,
+    .svg, .pdf) is a static image, which needs kaleido. It returns the figure
+    """
+    if output is None:
+        fig.show()
+    elif output.lower().endswith((".html", ".htm")):
+        fig.write_html(output)
+    else:
+        try:
+            import kaleido  # noqa: F401
+        except ImportError:
+            raise ImportError("Image output needs kaleido: pip install kaleido") from None
+        fig.write_image(output)
+    return fig
+
+
+def plot_top_players(players, title=f"Top Players", scenario_name ="", output=None):
     """
     This function is what creates the bar graph showing the top players 
     for each different situation in order. It shows their respective 
@@ -408,29 +3057,27 @@ def plot_top_players(players, title=f"Top Players", scenario_name =""):
     if not players:
         print("No players to plot.")
         return
-    dict_players = [p.to_dict() for p in players]
-    df = pd.DataFrame(flatten_player_dicts(dict_players))
-    if "Player" not in df.columns or "Score" not in df.columns:
-        print("Player or Score column missing!")
-        return
+    import plotly.express as px
+    columns = plot_columns(players, ())
     if scenario_name:
         title =f"{title} - {scenario_name} Scenario"
     fig = px.bar(
-        df,
-        x="Player",
-        y="Score",
+        x=columns["Player"],
+        y=columns["Score"],
+        labels={"x": "Player", "y": "Score"},
         title=title,
     )
-    fig.show()
+    return write_figure(fig, output)
 
 
 
-def plot_player_comparision(p1, p2):
+def plot_player_comparision(p1, p2, output=None):
     """
     This function is what creates the radar chart
     to closesly see the differences between two players in
     different areas of basketball skills
     """
+    import plotly.graph_objects as go
     categories = list(p1.norm_stats.keys())
 
     fig = go.Figure()
@@ -449,39 +3096,85 @@ def plot_player_comparision(p1, p2):
     ))
 
     fig.update_layout(title="Player Comparision Radar Chart")
-    fig.show()
+    return write_figure(fig, output)
 
-def plot_scatter(players, stat_x, stat_y):
+def plot_scatter(players, stat_x, stat_y, density=None, top_n=20, bins=60, output=None):
     """
     This function creates the scatterplot that compares players 
     to the relationship between two different stats 
-
+    Only the two stats, the names and the scores are read (see plot_columns), and above
+    webgl_threshold points they are drawn with WebGL so the browser keeps up.
+    With density="hist" (a bins x bins grid) or "hexbin" the points are counted into bins
+    here and only the bins are plotted, with the top_n players by score drawn over them,
+    so the size of the page stays the same however many players there are.
+    output writes the plot to a file instead of showing it (see write_figure)
     """
     if not players:
         print("No players to plot.")
         return
-    df = pd.DataFrame(flatten_player_dicts([p.to_dict() for p in players]))
-
-    if stat_x not in df.columns or stat_y not in df.columns:
-        print(f"Error: {stat_x}  or {stat_y} not in data. Available:", df.columns.tolist())
+    if density not in (None,) + density_modes:
+        raise ValueError(f"density has to be None or one of {list(density_modes)}, not {density!r}")
+    import plotly.graph_objects as go
+    # the raw stats keep their names, the normalized ones are e.g. "PTS_norm"
+    columns = plot_columns(players, [field for field in (stat_x, stat_y) if field != "Score"])
+
+    if stat_x not in columns or stat_y not in columns:
+        print(f"Error: {stat_x}  or {stat_y} not in data. Available:", plot_fields(players))
         return
-    fig = px.scatter(
-        df,
-        x=stat_x,
-        y=stat_y,
-        hover_name="Player",
-        title=f"{stat_x} vs {stat_y}"
-    )
-    fig.show()
+    x, y = np.asarray(columns[stat_x], dtype=float), np.asarray(columns[stat_y], dtype=float)
+    names = columns["Player"]
+    fig = go.Figure()
+    if density is None:
+        trace = go.Scattergl if len(players) > webgl_threshold else go.Scatter
+        fig.add_trace(trace(x=x, y=y, mode="markers", hovertext=names, name="Players"))
+    else:
+        present = ~(np.isnan(x) | np.isnan(y))
+        if density == "hist":
+            counts, x_edges, y_edges = np.histogram2d(x[present], y[present], bins)
+            fig.add_trace(go.Heatmap(
+                x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2,
+                # empty bins are left blank instead of drawn in the lowest color
+                z=np.where(counts.T > 0, counts.T, np.nan), colorscale="Viridis", colorbar={"title": "Players"}
+            ))
+        elif present.any():
+            hex_x, hex_y, counts = hexbin_counts(x[present], y[present], bins)
+            fig.add_trace(go.Scatter(
+                x=hex_x, y=hex_y, mode="markers", hovertext=[f"{count} players" for count in counts.tolist()],
+                marker={"symbol": "hexagon", "size": max(4, 760 / bins), "color": counts,
+                        "colorscale": "Viridis", "colorbar": {"title": "Players"}},
+                name="Players"
+            ))
+        top = top_n_indices(np.asarray(columns["Score"], dtype=float), top_n, lambda i: players[i].id)
+        fig.add_trace(go.Scatter(
+            x=x[top], y=y[top], mode="markers+text", text=[names[i] for i in top], textposition="top center",
+            marker={"color": "crimson", "size": 8}, name=f"Top {len(top)} by score"
+        ))
+    fig.update_layout(title=f"{stat_x} vs {stat_y}", xaxis_title=stat_x, yaxis_title=stat_y)
+    return write_figure(fig, output)
 
 
 def find_player_by_name(players, query):
-    # function loops through the list of players to find the players the players
-    # the user could have inputed (case insensitive)
-    matches = [p for p in players if query.lower() in p.name.lower()]
+    # function finds the players the user could have inputed (case and accent insensitive)
+    # players can be a RankingSystem (uses its name index) or a plain list of players.
+    # The best match is returned and the other candidates are printed so nothing is picked silently
+    if isinstance(players, RankingSystem):
+        matches = players.find_players(query)
+    else:
+        # a plain list is only searched once, so building an index for it would cost more than a scan
+        wanted = normalize_name(query)
+        ranked = []
+        for pos, player in enumerate(players if wanted else ()):
+            rank = name_match_rank(normalize_name(player.name), wanted)
+            if rank is not None:
+                ranked.append((rank, pos, player))
+        matches = [player for _, _, player in sorted(ranked, key=lambda match: match[:2])]
     if not matches:
         print(f"No player found matching '{query}'")
         return None
+    if len(matches) > 1:
+        others = ", ".join(p.name for p in matches[1:6])
+        more = f" and {len(matches) - 6} more" if len(matches) > 6 else ""
+        print(f"Using {matches[0].name} for '{query}' (other matches: {others}{more})")
     return matches[0]
 def weight_situation():
     # function allows the user to choose the type of situation they want to use to rank players
@@ -516,17 +3209,34 @@ def weight_situation():
 def list_all_players(players):
     for p in players:
         print(p.name)
-"""
- these next few lines set the player, ranking system, player lists, and normalizes
- and ranks all the data each player has. This will be used for the main menu function 
-"""
-players_list = read_csv_as_dicts("CS final project starter csv - Sheet1.csv")
-ranking_system = RankingSystem(min_games_played=20, min_minutes_played=15, weights=overall)
-ranking_system.add_player(players_list)
-top_players = ranking_system.normalize_and_rank()
+default_data_file = "CS final project starter csv - Sheet1.csv"
+_default_ranking_system = None
 
 
-def main_menu():
+def get_default_ranking_system():
+    """
+    This function sets up the player list and ranking system from the starter CSV, and normalizes
+    and ranks all the data each player has. This will be used for the main menu function.
+    It's only built the first time it's asked for, so importing this file doesn't load anything
+    """
+    global _default_ranking_system
+    if _default_ranking_system is None:
+        players_list = read_csv_as_dicts(default_data_file, use_cache=True)
+        ranking_system = RankingSystem(min_games_played=20, min_minutes_played=15, weights=overall)
+        ranking_system.add_player(players_list)
+        ranking_system.normalize_and_rank()
+        _default_ranking_system = ranking_system
+    return _default_ranking_system
+
+
+def __getattr__(name):
+    # keeps final_project.ranking_system working, it's just built lazily now
+    if name == "ranking_system":
+        return get_default_ranking_system()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def main_menu(ranking_system=None):
     """
     Essentially the "game_loop" for the project. 
     Utilizes a while loop to allow the user to do many different things
@@ -538,6 +3248,8 @@ def main_menu():
     doesn't cause an infinite loop 
 
     """
+    if ranking_system is None:
+        ranking_system = get_default_ranking_system()
 
     while True:
         print("\n--- NBA Player Analyzer Menu ---")
@@ -575,8 +3287,8 @@ def main_menu():
             name1 = input("Enter first player's name: ")
             name2 = input("Enter second player's name: ")
 
-            p1 = find_player_by_name(ranking_system.players, name1)
-            p2 = find_player_by_name(ranking_system.players, name2)
+            p1 = find_player_by_name(ranking_system, name1)
+            p2 = find_player_by_name(ranking_system, name2)
             if not p1 or not p2:
                 print("One or both players not found.")
                 continue
@@ -584,19 +3296,24 @@ def main_menu():
             
 
 
-            top_two = compare_players(p1, p2, scenario, "Custom" )
+            breakdowns = weighted_breakdown(p1, scenario), weighted_breakdown(p2, scenario)
+            top_two = compare_players(p1, p2, scenario, "Custom", breakdowns)
+            scores = {id(p1): breakdowns[0][1], id(p2): breakdowns[1][1]}
             print(f"\nComparision ({scenario} weights):")
             print("\nOverall Scores:")
             for p in top_two:
-                print(f"{p.name} - {p.score:.3f}")
+                print(f"{p.name} - {scores[id(p)]:.3f}")
         elif choice == 4:
             scenario = weight_situation() 
-            top_players = ranking_system.rank_by_situation(scenario, top_n=20)
             filename = input("Enter filename for CSV export (e.g. 'Clutch Rankings'): ")
-            export_rankings_to_csv(top_players, f"{filename}_Top20.csv")
-
-            all_players = ranking_system.rank_by_situation(scenario, top_n=len(ranking_system.players))
-            export_rankings_to_csv(all_players, f"{filename}_Full.csv")
+            # both files come from one ranking of the pool
+            result = ranking_system.score(scenario)
+            for path, top_n in ((f"{filename}_Top20.csv", 20), (f"{filename}_Full.csv", None)):
+                try:
+                    export_ranking(ranking_system, result, path, top_n=top_n)
+                    print(f"Exported full rankings to {path}")
+                except OSError:
+                    print(f"Error occurred when opening {path} to write")
         elif choice == 5: 
             scenario = weight_situation()
             top_n = int(input("How many players do you want to display? "))
@@ -608,8 +3325,8 @@ def main_menu():
             name1 = input("Enter first player's name: ")
             name2 = input("Enter second player's name: ")
 
-            p1 = find_player_by_name(ranking_system.players, name1)
-            p2 = find_player_by_name(ranking_system.players, name2)
+            p1 = find_player_by_name(ranking_system, name1)
+            p2 = find_player_by_name(ranking_system, name2)
             if not p1 or not p2:
                 print("One or both players not found.")
                 continue
@@ -647,9 +3364,6 @@ for rank, p in enumerate(ranking_system.to_dict_list(10), 1):
 #plot_top_players(top10, "Top 10 Overall Players")
 #plot_scatter(ranking_system.to_dict_list(), "PTS", "MP")
 
-main_menu()
-
-         
-
-
 
+if __name__ == "__main__":
+    main_menu()
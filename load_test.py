@@ -0,0 +1,129 @@
+"""
+Load test for ranking_server.py.
+It opens a number of keep-alive connections to a running server, sends requests
+from all of them at the same time for a while and reports the p50/p99 latency and
+requests per second for each endpoint.
+
+Run with:  python load_test.py --url http://127.0.0.1:8765 --connections 16 --duration 10
+       or: python load_test.py --spawn   (starts a local server on a free port first)
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+# the mix of requests each connection cycles through
+request_mix = [
+    ("GET", "/rank?scenario=overall&top_n=10", None),
+    ("GET", "/rank?scenario=best_defensive_player&top_n=25", None),
+    ("POST", "/rank", {"weights": {"AST": 0.6, "TOV": -0.4}, "top_n": 10}),
+    ("GET", "/lookup?q=curry&limit=5", None),
+    ("GET", "/compare?p1=LeBron&p2=Curry&scenario=best_clutch_player", None),
+]
+
+
+def percentile(sorted_values, fraction):
+    # function picks the value at this fraction of a sorted list (nearest rank)
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_connection(host, port, deadline, latencies, errors, offset):
+    # function sends requests over one connection until the deadline, recording each latency
+    reader, writer = await asyncio.open_connection(host, port)
+    i = offset
+    try:
+        while time.perf_counter() < deadline:
+            method, path, body = request_mix[i % len(request_mix)]
+            i += 1
+            payload = json.dumps(body).encode() if body is not None else b""
+            request = (f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(payload)}\r\n"
+                       f"Content-Type: application/json\r\n\r\n").encode() + payload
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            elapsed = (time.perf_counter() - start) * 1000
+            endpoint = path.split("?")[0]
+            if b" 200 " not in status_line:
+                errors[endpoint] = errors.get(endpoint, 0) + 1
+            latencies.setdefault(endpoint, []).append(elapsed)
+    finally:
+        writer.close()
+
+
+async def load_test(url, connections, duration):
+    parts = urlsplit(url)
+    latencies = {}
+    errors = {}
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(run_connection(parts.hostname, parts.port, deadline, latencies, errors, i)
+                           for i in range(connections)))
+    elapsed = time.perf_counter() - start
+    total = sum(len(values) for values in latencies.values())
+    print(f"\n{total} requests over {connections} connections in {elapsed:.1f} s "
+          f"({total / elapsed:.0f} requests/s)")
+    print(f"{'endpoint':<10} {'count':>7} {'p50 (ms)':>9} {'p99 (ms)':>9} {'errors':>7}")
+    all_values = []
+    for endpoint, values in sorted(latencies.items()):
+        values.sort()
+        all_values.extend(values)
+        print(f"{endpoint:<10} {len(values):>7} {percentile(values, 0.5):>9.2f} "
+              f"{percentile(values, 0.99):>9.2f} {errors.get(endpoint, 0):>7}")
+    all_values.sort()
+    print(f"{'all':<10} {len(all_values):>7} {percentile(all_values, 0.5):>9.2f} {percentile(all_values, 0.99):>9.2f}")
+
+
+def spawn_server():
+    # function starts ranking_server.py on a free port and waits until it answers
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    # the server (and the starter CSV it serves by default) are found next to this file,
+    # so the load test can be run from any directory
+    server_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ranking_server.py")
+    process = subprocess.Popen([sys.executable, server_script, "--port", str(port)],
+                               cwd=os.path.dirname(server_script), stdout=subprocess.DEVNULL)
+    for _ in range(200):
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("the ranking server did not start")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test a running ranking_server.py")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run for")
+    parser.add_argument("--spawn", action="store_true", help="start a local server first")
+    args = parser.parse_args()
+    server = None
+    if args.spawn:
+        server, args.url = spawn_server()
+    try:
+        asyncio.run(load_test(args.url, args.connections, args.duration))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
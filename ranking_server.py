@@ -0,0 +1,335 @@
+"""
+Ranking server for the NBA Player Analyzer.
+It keeps one warm RankingSystem in memory and answers HTTP/JSON requests on a local
+port, so other programs don't have to re-import final_project (and re-parse the CSV)
+or drive the menu over stdin. When the CSV changes on disk the data is reloaded in
+the background and swapped in once it's ready.
+
+Run with:  python ranking_server.py --port 8765
+
+Endpoints (all GET, except POST /rank which also takes a JSON body):
+    /health                                 data version and player count
+    /rank?scenario=overall&top_n=10         top players for a preset scenario
+    /rank  {"weights": {...}, "top_n": 10}  top players for custom weights (POST)
+    /rank?scenario=overall&pos=PG,SG&max_age=24&normalize=subset
+                                            filtered ranking (team, pos, min_/max_age, min_/max_games,
+                                            min_/max_minutes, or "filters" in the JSON body)
+    /groups?scenario=overall&by=team&top_n=3&sort=mean
+                                            per group top players and count/mean/max/minutes_weighted
+                                            scores (by team, position, age, ...), takes the same filters
+    /compare?p1=LeBron&p2=Curry&scenario=overall
+    /lookup?q=curry&limit=10                name lookup, best match first
+    /similar?p=Curry&k=20&metric=cosine     the players most like p (metric cosine or euclidean)
+    /export?scenario=overall&top_n=20       ranking as CSV text
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import math
+import os
+from urllib.parse import parse_qs, urlsplit
+
+from final_project import (RankingSystem, default_data_file, filter_key, load_player_columns, preset_scenarios,
+                           similarity_metrics, weighted_breakdown, write_ranking)
+
+
+logger = logging.getLogger("ranking_server")
+
+
+class BadRequest(Exception):
+    # raised by a handler when the request is missing something, sent back as a 400
+    pass
+
+
+def build_ranking_system(filename, min_games_played=20, min_minutes_played=15):
+    # function loads the CSV (through the binary snapshot) and normalizes it so the first request is fast
+    ranking_system = RankingSystem(min_games_played=min_games_played, min_minutes_played=min_minutes_played)
+    ranking_system.add_columns(load_player_columns(filename))
+    ranking_system.calculate_min_max()
+    ranking_system.name_index()
+    return ranking_system
+
+
+def player_json(player, score=None):
+    # function turns a player into the JSON that the endpoints send back
+    return {
+        "ID": player.id,
+        "Player": player.name,
+        "Team": player.team,
+        "Pos": player.position,
+        "Age": player.age,
+        "G": player.games_played,
+        "MP": player.min_played,
+        "Score": player.score if score is None else score
+    }
+
+
+"""
+RankingService owns the warm RankingSystem and the handlers for each endpoint.
+The handlers run on the event loop one at a time and never await in the middle,
+so two requests can't see the RankingSystem half way through a change. Reloading
+builds a brand new RankingSystem in a worker thread and then swaps the reference,
+so requests keep being answered from the old data until the new data is ready
+"""
+class RankingService:
+    def __init__(self, filename, reload_interval=2.0):
+        self.filename = filename
+        self.reload_interval = reload_interval
+        self.ranking_system = build_ranking_system(filename)
+        self.data_version = 1
+        self._source_state = self._stat_source()
+        self.routes = {
+            "/health": self.handle_health,
+            "/rank": self.handle_rank,
+            "/groups": self.handle_groups,
+            "/compare": self.handle_compare,
+            "/lookup": self.handle_lookup,
+            "/similar": self.handle_similar,
+            "/export": self.handle_export,
+        }
+
+    def _stat_source(self):
+        stat = os.stat(self.filename)
+        return stat.st_size, stat.st_mtime_ns
+
+    async def watch_source(self):
+        # method checks the CSV every reload_interval seconds and reloads it when it changed
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                state = self._stat_source()
+                if state == self._source_state:
+                    continue
+                ranking_system = await loop.run_in_executor(None, build_ranking_system, self.filename)
+            except (OSError, ValueError) as e:
+                logger.warning("Reload of %s failed, keeping the old data: %s", self.filename, e)
+                continue
+            self.ranking_system = ranking_system
+            self._source_state = state
+            self.data_version += 1
+            logger.info("Reloaded %s (%d players)", self.filename, len(ranking_system.players))
+
+    def _weights(self, params, body):
+        # the weights come from a JSON body or a preset scenario name
+        if body and "weights" in body:
+            weights = body["weights"]
+            # json reads NaN and Infinity as numbers and true/false are ints to Python, none of them are weights
+            if not isinstance(weights, dict) or not all(
+                    isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) for v in weights.values()):
+                raise BadRequest("weights must be an object of stat: finite number")
+            return body.get("scenario", "custom"), weights
+        scenario = params.get("scenario", "overall")
+        if scenario not in preset_scenarios:
+            raise BadRequest(f"unknown scenario {scenario!r}, choose from {list(preset_scenarios)}")
+        return scenario, preset_scenarios[scenario]
+
+    def _top_n(self, params, body, default):
+        try:
+            top_n = int((body or {}).get("top_n", params.get("top_n", default)))
+        except (TypeError, ValueError):
+            raise BadRequest("top_n must be a whole number")
+        if top_n < 0:
+            raise BadRequest("top_n can't be negative")
+        return top_n
+
+    # query parameters that filter a ranking: parameter -> (field, range end or None for a list)
+    filter_params = {
+        "team": ("team", None), "pos": ("position", None),
+        "min_age": ("age", "min"), "max_age": ("age", "max"),
+        "min_games": ("games_played", "min"), "max_games": ("games_played", "max"),
+        "min_minutes": ("min_played", "min"), "max_minutes": ("min_played", "max"),
+    }
+
+    def _filters(self, params, body):
+        # the filters come from the JSON body or the query parameters, checked by filter_key
+        filters = dict((body or {}).get("filters") or {})
+        try:
+            for param, (field, end) in self.filter_params.items():
+                if param not in params:
+                    continue
+                if end is None:
+                    filters[field] = params[param].split(",")
+                else:
+                    filters.setdefault(field, {})[end] = float(params[param])
+            filter_key(filters)
+        except (ValueError, TypeError, AttributeError) as e:
+            raise BadRequest(f"bad filter: {e}")
+        normalize = (body or {}).get("normalize", params.get("normalize", "pool"))
+        if normalize not in ("pool", "subset"):
+            raise BadRequest("normalize must be pool or subset")
+        return filters, normalize
+
+    def _find(self, query):
+        if not query:
+            raise BadRequest("missing player name")
+        matches = self.ranking_system.find_players(query, limit=5)
+        if not matches:
+            raise BadRequest(f"no player found matching {query!r}")
+        return matches
+
+    def handle_health(self, params, body):
+        return {"status": "ok", "data_version": self.data_version, "players": len(self.ranking_system.players)}
+
+    def handle_rank(self, params, body):
+        # rank_many doesn't change Player.score, so a ranking never disturbs other requests
+        scenario, weights = self._weights(params, body)
+        top_n = self._top_n(params, body, 10)
+        filters, normalize = self._filters(params, body)
+        ranked = self.ranking_system.rank_many({scenario: weights}, top_n, filters, normalize)[scenario]
+        return {"scenario": scenario, "data_version": self.data_version,
+                "players": [player_json(player, score) for player, score in ranked]}
+
+    def handle_groups(self, params, body):
+        scenario, weights = self._weights(params, body)
+        top_n = self._top_n(params, body, 5)
+        filters, normalize = self._filters(params, body)
+        by = (body or {}).get("by", params.get("by", "team"))
+        sort_by = (body or {}).get("sort", params.get("sort", "mean"))
+        try:
+            groups = self.ranking_system.rank_groups(weights, by, top_n, filters, normalize)
+            table = groups.table(sort_by)
+        except ValueError as e:
+            raise BadRequest(str(e))
+        return {"scenario": scenario, "by": by, "data_version": self.data_version,
+                "groups": [dict(row, players=[player_json(player, score) for player, score in groups.top(row[by])])
+                           for row in table]}
+
+    def handle_compare(self, params, body):
+        scenario, weights = self._weights(params, body)
+        self.ranking_system.calculate_min_max()
+        p1 = self._find(params.get("p1"))[0]
+        p2 = self._find(params.get("p2"))[0]
+        p1_stats, p1_score = weighted_breakdown(p1, weights)
+        p2_stats, p2_score = weighted_breakdown(p2, weights)
+        better = p1.name if p1_score > p2_score else p2.name if p2_score > p1_score else None
+        return {"scenario": scenario, "better": better,
+                "players": [dict(player_json(p1, p1_score), Stats=p1_stats),
+                            dict(player_json(p2, p2_score), Stats=p2_stats)]}
+
+    def handle_lookup(self, params, body):
+        limit = self._top_n({"top_n": params.get("limit", 10)}, None, 10)
+        matches = self.ranking_system.find_players(params.get("q", ""), limit=limit)
+        return {"matches": [player_json(player) for player in matches]}
+
+    def handle_similar(self, params, body):
+        player = self._find(params.get("p"))[0]
+        k = self._top_n({"top_n": params.get("k", 20)}, None, 20)
+        metric = params.get("metric", "cosine")
+        if metric not in similarity_metrics:
+            raise BadRequest(f"unknown metric {metric!r}, choose from {list(similarity_metrics)}")
+        similar = self.ranking_system.similar_players(player, k, metric)
+        value_name = "Similarity" if metric == "cosine" else "Distance"
+        return {"player": player_json(player), "metric": metric,
+                "similar": [dict(player_json(other), **{value_name: value}) for other, value in similar]}
+
+    def handle_export(self, params, body):
+        # export is sent back as CSV text instead of JSON
+        scenario, weights = self._weights(params, body)
+        top_n = self._top_n(params, body, len(self.ranking_system.players))
+        filters, normalize = self._filters(params, body)
+        result = self.ranking_system.score(weights, filters, normalize)
+        out = io.StringIO()
+        if len(result.scores):
+            write_ranking(out, self.ranking_system, result, result.top_indices(top_n))
+        return out.getvalue()
+
+    def dispatch(self, method, target, body_bytes):
+        # method runs the handler for a request and returns (status, content type, body bytes)
+        url = urlsplit(target)
+        handler = self.routes.get(url.path)
+        if handler is None:
+            return 404, "application/json", json.dumps({"error": f"no endpoint {url.path}"}).encode()
+        if method not in ("GET", "POST"):
+            return 405, "application/json", json.dumps({"error": f"{method} not allowed"}).encode()
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            body = json.loads(body_bytes) if body_bytes else None
+            if body is not None and not isinstance(body, dict):
+                raise BadRequest("the JSON body must be an object")
+            result = handler(params, body)
+            if isinstance(result, str):
+                return 200, "text/csv; charset=utf-8", result.encode()
+            return 200, "application/json", json.dumps(result).encode()
+        except (BadRequest, json.JSONDecodeError) as e:
+            return 400, "application/json", json.dumps({"error": str(e)}).encode()
+        except UnicodeDecodeError:
+            return 400, "application/json", json.dumps({"error": "the body must be UTF-8 JSON"}).encode()
+        except Exception:
+            # a bug in a handler must not drop the connection: log the traceback and answer with a 500
+            logger.exception("%s %s failed", method, target)
+            return 500, "application/json", json.dumps({"error": "internal server error"}).encode()
+
+    @staticmethod
+    async def _respond(writer, status, content_type, payload, keep_alive):
+        writer.write(
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload
+        )
+        await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        # method reads HTTP/1.1 requests off one connection (keep-alive) and answers each of them
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = headers.get("content-length", "0") or "0"
+                if not (length.isascii() and length.isdigit()):
+                    # without a length the body can't be told apart from the next request, so the
+                    # connection is closed after the error
+                    error = json.dumps({"error": f"bad Content-Length {length!r}"}).encode()
+                    await self._respond(writer, 400, "application/json", error, keep_alive=False)
+                    break
+                body_bytes = await reader.readexactly(int(length)) if int(length) else b""
+                status, content_type, payload = self.dispatch(method, target, body_bytes)
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                await self._respond(writer, status, content_type, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(filename=default_data_file, host="127.0.0.1", port=8765, reload_interval=2.0):
+    # function starts the server and runs it until it's stopped
+    service = RankingService(filename, reload_interval)
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    logger.info("Serving %d players on http://%s:%d", len(service.ranking_system.players), host, port)
+    watcher = asyncio.create_task(service.watch_source())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        watcher.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve NBA player rankings over local HTTP/JSON")
+    parser.add_argument("--csv", default=default_data_file, help="player CSV to serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--reload-interval", type=float, default=2.0, help="seconds between checks of the CSV")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(serve(args.csv, args.host, args.port, args.reload_interval))
+    except KeyboardInterrupt:
+        pass
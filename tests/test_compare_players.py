@@ -0,0 +1,17 @@
+import final_project
+from final_project import Player, RankingSystem, compare_players, weighted_breakdown
+
+
+def test_compare_players_reuses_the_breakdowns(monkeypatch, capsys):
+    ranking_system = RankingSystem(min_games_played=0, min_minutes_played=0)
+    ranking_system.add_player([Player("A", "BOS", "PG", 25, 60, 30.0, {"PTS": 10.0, "AST": 8.0}),
+                               Player("B", "LAL", "SF", 30, 70, 35.0, {"PTS": 20.0, "AST": 2.0})])
+    a, b = ranking_system.players
+    weights = {"PTS": 0.4, "AST": 0.6}
+    breakdowns = weighted_breakdown(a, weights), weighted_breakdown(b, weights)
+    expected = compare_players(a, b, weights)
+    printed = capsys.readouterr().out
+
+    monkeypatch.setattr(final_project, "weighted_breakdown", lambda *args: 1 / 0)
+    assert compare_players(a, b, weights, breakdowns=breakdowns) == expected == [a, b]
+    assert capsys.readouterr().out == printed
@@ -0,0 +1,78 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from final_project import PlayerColumns, RankingSystem
+
+stat_names = ("PTS", "AST", "TRB", "STL", "BLK", "TOV", "FG%", "3P%")
+
+
+def make_ranking_system(n=3_000, seed=0):
+    rng = np.random.default_rng(seed)
+    columns = PlayerColumns(
+        [f"Player {i}" for i in range(n)], [f"T{i % 30}" for i in range(n)], ["PG", "SG", "C"] * (n // 3) + ["PG"] * (n % 3),
+        rng.integers(19, 38, n), np.full(n, 60), np.full(n, 30.0), list(stat_names),
+        # rounded so some scores tie and the tie breaking is checked too
+        np.round(rng.random((n, len(stat_names))), 2)
+    )
+    ranking_system = RankingSystem(cache_size=8)
+    ranking_system.add_columns(columns)
+    return ranking_system
+
+
+def make_scenarios(count=24, seed=0):
+    rng = random.Random(seed)
+    return [{stat: rng.uniform(-1, 1) for stat in rng.sample(stat_names, 4)} for _ in range(count)]
+
+
+def ranked_ids(ranked):
+    return [(player.id, score) for player, score in ranked]
+
+
+def test_threads_get_the_same_rankings_as_one_thread():
+    scenarios = make_scenarios()
+    filters = [None, {"team": ["T1", "T2"]}, {"age": (None, 24), "position": "C"}]
+    sequential = make_ranking_system()
+    expected = {(i, j): ranked_ids(sequential.rank(weights, 10, filters[j]))
+                for i, weights in enumerate(scenarios) for j in range(len(filters))}
+    # a cache smaller than the number of scenarios, so results keep being evicted and worked out again
+    shared = make_ranking_system()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        got = []
+        for _ in range(150):
+            i, j = rng.randrange(len(scenarios)), rng.randrange(len(filters))
+            if rng.random() < 0.5:
+                ranked = shared.rank(scenarios[i], 10, filters[j])
+            else:
+                ranked = shared.rank_many({"s": scenarios[i]}, 10, filters[j])["s"]
+            got.append(((i, j), ranked_ids(ranked)))
+        return got
+
+    with ThreadPoolExecutor(8) as pool:
+        results = [item for got in pool.map(worker, range(8)) for item in got]
+    assert shared.cache_stats()["evictions"] > 0
+    mismatches = [key for key, ranked in results if ranked != expected[key]]
+    assert mismatches == []
+
+
+def test_results_share_the_pool_and_look_players_up_by_row():
+    ranking_system = make_ranking_system(300)
+    weights = make_scenarios(1)[0]
+    result = ranking_system.score(weights)
+    filtered = ranking_system.score(weights, {"team": "T3"})
+    assert result._players is ranking_system.players and filtered._players is ranking_system.players
+    for player, score in result.top(20):
+        assert result.score_of(player) == score
+    for player, score in filtered.top(5):
+        assert filtered.score_of(player) == score
+    with pytest.raises(ValueError):
+        filtered.score_of(ranking_system.find_players("Player 4")[0])
+    # players added later don't move the scored ones
+    before = result.top(20)
+    ranking_system.add_columns(PlayerColumns(["Late"], ["T3"], ["PG"], np.array([25]), np.array([60]),
+                                             np.array([30.0]), list(stat_names), np.ones((1, len(stat_names)))))
+    assert result.top(20) == before and len(result.scores) == 300
@@ -0,0 +1,60 @@
+import csv
+
+import numpy as np
+import pytest
+
+from final_project import Player, RankingSystem, export_ranking, overall, top_n_indices, write_figure
+
+
+@pytest.fixture
+def ranking_system():
+    rng = np.random.default_rng(3)
+    ranking_system = RankingSystem(min_games_played=0, min_minutes_played=0)
+    teams = ["BOS", "LAL", "NOP", "TOR"]
+    # few distinct stat values so plenty of scores tie
+    ranking_system.add_player([Player(f"Player {i % 40}", teams[i % 4], "PG", 25, 60, 30.0,
+                                      {stat: float(rng.integers(0, 3)) for stat in overall})
+                               for i in range(300)])
+    return ranking_system
+
+
+@pytest.mark.parametrize("filters", [None, {"team": ["BOS", "TOR"]}])
+def test_full_order_breaks_ties_like_top_n_indices(ranking_system, filters):
+    result = ranking_system.score(overall, filters)
+    expected = top_n_indices(result.scores, len(result.scores), lambda i: result._player(i).id)
+    assert result.top_indices(None) == expected
+    # the top 20 after the full order is the start of it
+    assert result.top_indices(20) == expected[:20]
+
+
+def test_full_order_sees_players_added_later(ranking_system):
+    result = ranking_system.score(overall)
+    ranking_system.add_player(Player("Late", "BOS", "PG", 25, 60, 30.0, {stat: 2.0 for stat in overall}))
+    assert result.top_indices(None) == top_n_indices(result.scores, None, lambda i: result._player(i).id)
+
+
+def test_parquet_export_matches_csv(ranking_system, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    result = ranking_system.score(overall)
+    export_ranking(ranking_system, result, tmp_path / "ranking.csv")
+    export_ranking(ranking_system, result, str(tmp_path / "ranking.parquet"), fmt="parquet")
+    with open(tmp_path / "ranking.csv", newline="", encoding="utf-8") as f:
+        headers, *lines = list(csv.reader(f))
+    table = pq.read_table(tmp_path / "ranking.parquet")
+    assert table.column_names == headers
+    assert table.column("Player").to_pylist() == [line[0] for line in lines]
+    np.testing.assert_allclose(table.column("Score").to_numpy(), [float(line[6]) for line in lines])
+
+
+def test_write_figure_png(tmp_path):
+    pytest.importorskip("kaleido")
+    go = pytest.importorskip("plotly.graph_objects")
+    output = tmp_path / "figure.png"
+    try:
+        write_figure(go.Figure(go.Bar(x=["A", "B"], y=[1, 2])), str(output))
+    except RuntimeError as e:
+        # kaleido 1.x renders through a Chrome install of its own
+        if "Chrome" not in str(e):
+            raise
+        pytest.skip("kaleido can't find Chrome")
+    assert output.read_bytes().startswith(b"\x89PNG")
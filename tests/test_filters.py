@@ -0,0 +1,71 @@
+import pytest
+
+from final_project import Player, RankingSystem, filter_key, overall
+
+
+def make_player(name, team, age=25, points=1.0):
+    stats = {stat: 1.0 for stat in overall}
+    stats["PTS"] = points
+    return Player(name, team, "PG", age, 60, 30.0, stats)
+
+
+@pytest.fixture
+def ranking_system():
+    ranking_system = RankingSystem()
+    ranking_system.add_player([
+        make_player("Kelly Olynyk", "NOP / TOR", 33, 10.0),
+        make_player("Kelly Olynyk", "TOR", 33, 8.0),
+        make_player("Scottie Barnes", "TOR", 23, 20.0),
+        make_player("Zion Williamson", "NOP", 24, 25.0),
+        make_player("Jayson Tatum", "BOS", 26, 30.0),
+    ])
+    return ranking_system
+
+
+@pytest.mark.parametrize("filters", [{"team": [["TOR"]]}, {"team": 5}, {"age": "abc"}, {"age": ["25"]},
+                                     {"age": {"min": "a"}}, {"age": True}, {"height": 80}])
+def test_filter_key_rejects_bad_values(filters):
+    with pytest.raises(ValueError):
+        filter_key(filters)
+
+
+def test_traded_player_is_listed_once_per_team_filter(ranking_system):
+    ranked = ranking_system.rank(overall, 10, {"team": "TOR"})
+    assert [(player.name, player.team) for player, _ in ranked].count(("Kelly Olynyk", "TOR")) == 1
+    assert ("Kelly Olynyk", "NOP / TOR") not in [(player.name, player.team) for player, _ in ranked]
+    # without a stint row for NOP the season total row stands for the player there
+    nop = [(player.name, player.team) for player, _ in ranking_system.rank(overall, 10, {"team": "NOP"})]
+    assert ("Kelly Olynyk", "NOP / TOR") in nop
+    both = [player.name for player, _ in ranking_system.rank(overall, 10, {"team": ["NOP", "TOR"]})]
+    assert both.count("Kelly Olynyk") == 1
+
+
+def test_filters_agree_with_team_groups(ranking_system):
+    groups = ranking_system.rank_groups(overall, "team", top_n=10)
+    for team in ("BOS", "NOP", "TOR"):
+        ranked = ranking_system.rank(overall, 10, {"team": team})
+        assert [player for player, _ in ranked] == [player for player, _ in groups.top(team)]
+
+
+def test_changed_team_rebuilds_the_index(ranking_system):
+    assert len(ranking_system.rank(overall, 10, {"team": "BOS"})) == 1
+    barnes = ranking_system.find_players("Scottie Barnes")[0]
+    barnes.team = "BOS"
+    assert {player.name for player, _ in ranking_system.rank(overall, 10, {"team": "BOS"})} == {"Jayson Tatum", "Scottie Barnes"}
+    barnes.age = 40
+    assert [player.name for player, _ in ranking_system.rank(overall, 10, {"age": (35, None)})] == ["Scottie Barnes"]
+
+
+def test_stint_team_spelled_differently():
+    ranking_system = RankingSystem()
+    ranking_system.add_player([
+        make_player("Kelly Olynyk", "NOP / TOR", 33, 10.0),
+        make_player("Kelly Olynyk", " tor ", 33, 8.0),
+        make_player("Scottie Barnes", "TOR", 23, 20.0),
+    ])
+    group_values, codes, rows = ranking_system.attribute_index().groups("team")
+    assert group_values == ["NOP", "TOR"]
+    tor = rows[codes == group_values.index("TOR")].tolist()
+    assert sorted(tor) == [1, 2]
+    ranked = ranking_system.rank(overall, 10, {"team": "tor"})
+    assert [(player.name, player.team) for player, _ in ranked] == [("Scottie Barnes", "TOR"), ("Kelly Olynyk", " tor ")]
@@ -0,0 +1,55 @@
+import csv
+
+from final_project import GameLog, game_log_stats, instrumentation, overall
+
+
+def game(player, points, age="25", **fields):
+    row = {"Player": player, "Team": "BOS", "Pos": "PG", "Age": age}
+    row.update({stat: "1" for stat in game_log_stats})
+    row["PTS"] = str(points)
+    row.update(fields)
+    return row
+
+
+def test_bad_rows_are_skipped_and_reported():
+    errors = []
+    log = GameLog(windows=(1,), on_error=lambda line, message: errors.append(line))
+    read = log.add_games([game("A", 10), game("B", 20, age=""), game("C", 5, age="abc"), {"PTS": "3"}, game("D", 1)])
+    assert read == 5
+    assert errors == [3, 4]
+    assert sorted(player.name for player, _ in log.rank(overall, 1, 10)) == ["A", "B", "D"]
+
+
+def test_add_games_takes_an_iterator_while_instrumented():
+    instrumentation.reset()
+    instrumentation.enable()
+    try:
+        log = GameLog(windows=(1,))
+        assert log.add_games(iter([game("A", 10), game("B", 20)])) == 2
+        assert instrumentation.stats()["game_log"]["rows"] == 2
+    finally:
+        instrumentation.disable()
+        instrumentation.reset()
+
+
+def test_read_new_games_streams_from_the_last_offset(tmp_path):
+    path = tmp_path / "games.csv"
+    fields = ["Player", "Team", "Pos", "Age"] + list(game_log_stats)
+    errors = []
+    log = GameLog(windows=(1, 2), on_error=lambda line, message: errors.append(line))
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fields)
+        writer.writeheader()
+        writer.writerow(game("A", 10))
+        writer.writerow(game("B", 20, age="n/a"))
+        f.write("\n")
+        f.write("C,BOS,PG,2")
+    assert log.read_new_games(str(path), batch_size=1) == 2
+    assert errors == [3]
+    assert len(log) == 1
+    # the unfinished line is read once its newline is there, and nothing is read twice
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        f.write("5," + ",".join(["1"] * len(game_log_stats)) + "\n")
+    assert log.read_new_games(str(path)) == 1
+    assert log.read_new_games(str(path)) == 0
+    assert len(log) == 2
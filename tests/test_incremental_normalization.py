@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from final_project import Player, RankingSystem, minmax_normalize
+
+stat_names = ("PTS", "AST", "TRB")
+
+
+@pytest.fixture
+def ranking_system(monkeypatch):
+    rng = np.random.default_rng(0)
+    ranking_system = RankingSystem(min_games_played=0, min_minutes_played=0)
+    for i in range(200):
+        stats = dict(zip(stat_names, rng.integers(0, 30, len(stat_names)).astype(float).tolist()))
+        ranking_system.add_player(Player(f"Player {i}", "BOS", "PG", 25, 60, 30.0, stats))
+    ranking_system.calculate_min_max()
+    # every update in these tests has to go through the incremental path
+    calls = []
+    incremental = RankingSystem._incremental_min_max
+    monkeypatch.setattr(RankingSystem, "_incremental_min_max",
+                        lambda self, changes: calls.append(len(changes)) or incremental(self, changes))
+    ranking_system.incremental_calls = calls
+    return ranking_system
+
+
+def assert_matches_full_pass(ranking_system):
+    ranking_system.calculate_min_max()
+    assert ranking_system.incremental_calls, "the incremental path wasn't taken"
+    matrix = ranking_system.matrix
+    norm = matrix.norm[:matrix.size].copy()
+    norm_min, norm_max = dict(ranking_system.norm_min), dict(ranking_system.norm_max)
+    ranking_system.calculate_min_max(force=True)
+    np.testing.assert_allclose(norm, matrix.norm[:matrix.size], atol=1e-12)
+    np.testing.assert_allclose(norm, np.nan_to_num(minmax_normalize(matrix.values[:matrix.size])), atol=1e-12)
+    assert norm_min == ranking_system.norm_min and norm_max == ranking_system.norm_max
+
+
+def column(ranking_system, stat):
+    matrix = ranking_system.matrix
+    return matrix.values[:matrix.size, matrix.stat_index[stat]]
+
+
+def test_add_player_with_new_extremes(ranking_system):
+    ranking_system.add_player(Player("High", "BOS", "PG", 25, 60, 30.0, {"PTS": 100.0, "AST": -5.0, "TRB": 10.0}))
+    ranking_system.add_player(Player("Missing", "BOS", "PG", 25, 60, 30.0, {"PTS": 3.0}))
+    assert_matches_full_pass(ranking_system)
+    assert ranking_system.norm_max["PTS"] == 100.0 and ranking_system.norm_min["AST"] == -5.0
+
+
+def test_set_stat_lowering_the_max(ranking_system):
+    row = int(np.argmax(column(ranking_system, "PTS")))
+    # only one player at the max, so the max has to come down to the next highest value
+    column(ranking_system, "PTS")[column(ranking_system, "PTS") == column(ranking_system, "PTS")[row]] = 29.0
+    ranking_system.calculate_min_max(force=True)
+    ranking_system.players[row].set_stat("PTS", 50.0)
+    ranking_system.calculate_min_max()
+    ranking_system.players[row].set_stat("PTS", 1.0)
+    assert_matches_full_pass(ranking_system)
+    assert ranking_system.norm_max["PTS"] == 29.0
+
+
+def test_set_stat_raising_the_min(ranking_system):
+    row = int(np.argmin(column(ranking_system, "AST")))
+    ranking_system.players[row].set_stat("AST", -10.0)
+    ranking_system.calculate_min_max()
+    ranking_system.players[row].set_stat("AST", 15.0)
+    assert_matches_full_pass(ranking_system)
+
+
+def test_ties_at_the_max(ranking_system):
+    top = column(ranking_system, "TRB").max()
+    tied = np.flatnonzero(column(ranking_system, "TRB") == top)
+    if len(tied) < 2:
+        ranking_system.players[int(np.argmin(column(ranking_system, "TRB")))].set_stat("TRB", top)
+        ranking_system.calculate_min_max()
+        tied = np.flatnonzero(column(ranking_system, "TRB") == top)
+    # lowering one of the tied players keeps the max, lowering the last one moves it
+    for row in tied[:-1].tolist():
+        ranking_system.players[row].set_stat("TRB", 0.0)
+        assert_matches_full_pass(ranking_system)
+        assert ranking_system.norm_max["TRB"] == top
+    ranking_system.players[int(tied[-1])].set_stat("TRB", 0.0)
+    assert_matches_full_pass(ranking_system)
+    assert ranking_system.norm_max["TRB"] < top
+
+
+def test_non_numeric_values(ranking_system):
+    ranking_system.players[0].set_stat("PTS", "n/a")
+    ranking_system.players[1].set_stat("AST", np.nan)
+    assert_matches_full_pass(ranking_system)
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from final_project import (Player, RankingSystem, export_ranking, export_rankings_to_csv, instrumentation,
+                           overall)
+
+
+@pytest.fixture
+def ranking_system():
+    rng = np.random.default_rng(0)
+    ranking_system = RankingSystem()
+    for i in range(30):
+        stats = {stat: float(value) for stat, value in zip(overall, rng.random(len(overall)))}
+        ranking_system.add_player(Player(f"Player {i}", "BOS", "PG", 25, 60, 30.0, stats))
+    return ranking_system
+
+
+@pytest.fixture
+def instrumented_run():
+    instrumentation.reset()
+    instrumentation.enable()
+    yield instrumentation
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_keyword_arguments_are_counted(ranking_system, instrumented_run, tmp_path):
+    result = ranking_system.score(overall)
+    path = export_ranking(ranking_system, result=result, path=str(tmp_path / "rank.csv"), top_n=5)
+    assert path == str(tmp_path / "rank.csv")
+    export_rankings_to_csv(players=ranking_system.rank_by_situation(overall, 10), filename=str(tmp_path / "old.csv"))
+    stats = instrumented_run.stats()
+    assert stats["export_ranking"]["rows"] == 5
+    assert stats["export_rankings_to_csv"]["rows"] == 10
+
+
+def test_failing_counter_counts_zero_rows(ranking_system, instrumented_run, tmp_path):
+    # an iterator has no len(), the call still returns normally and is recorded with 0 rows
+    players = ranking_system.rank_by_situation(overall, 10)
+    export_rankings_to_csv(iter(players), str(tmp_path / "old.csv"))
+    stats = instrumented_run.stats()["export_rankings_to_csv"]
+    assert stats["calls"] == 1 and stats["rows"] == 0
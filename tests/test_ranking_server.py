@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+import pytest
+
+from final_project import default_data_file
+from ranking_server import RankingService
+
+
+@pytest.fixture(scope="module")
+def service():
+    return RankingService(default_data_file, reload_interval=60)
+
+
+def request(service, raw):
+    # sends raw bytes through handle_connection and returns (status, JSON body) of the first response
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        written = bytearray()
+
+        class Writer:
+            def write(self, data):
+                written.extend(data)
+
+            async def drain(self):
+                pass
+
+            def close(self):
+                pass
+        await service.handle_connection(reader, Writer())
+        return bytes(written)
+    response = asyncio.run(run())
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-1", b"\xb2"])
+def test_bad_content_length_is_a_400(service, length):
+    status, body = request(service, b"POST /rank HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n{}")
+    assert status == 400 and "Content-Length" in body["error"]
+
+
+def test_body_that_is_not_utf8_is_a_400(service):
+    payload = b'{"weights": {"PTS": 1}, "scenario": "\xff"}'
+    status, _ = request(service, b"POST /rank HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % len(payload) + payload)
+    assert status == 400
+
+
+def test_handler_errors_are_a_logged_500(service, monkeypatch, caplog):
+    def broken(params, body):
+        raise RuntimeError("boom")
+    monkeypatch.setitem(service.routes, "/health", broken)
+    status, _, body = service.dispatch("GET", "/health", b"")
+    assert status == 500 and b"internal server error" in body
+    assert "boom" in caplog.text
+
+
+@pytest.mark.parametrize("weights", [b'{"AST": NaN}', b'{"AST": Infinity}', b'{"AST": -Infinity}', b'{"AST": true}',
+                                     b'{"AST": "1"}'])
+def test_weights_must_be_finite_numbers(service, weights):
+    status, _, _ = service.dispatch("POST", "/rank", b'{"weights": ' + weights + b'}')
+    assert status == 400
+
+
+@pytest.mark.parametrize("target", ["/rank?top_n=-1", "/lookup?q=a&limit=-3", "/similar?p=Curry&k=-1"])
+def test_negative_counts_are_a_400(service, target):
+    status, _, _ = service.dispatch("GET", target, b"")
+    assert status == 400
+
+
+def test_weights_rank(service):
+    status, _, body = service.dispatch("POST", "/rank", b'{"weights": {"AST": 1, "PTS": 0.5}, "top_n": 3}')
+    assert status == 200 and len(json.loads(body)["players"]) == 3
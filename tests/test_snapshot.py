@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+
+import final_project
+from final_project import load_player_columns, load_snapshot
+
+csv_text = "Player,Age,Team,Pos,G,MP,PTS,AST\nA,25,BOS,PG,60,30,20,5\n\nB,27,LAL,C,70,32,15,2\n"
+
+
+def write_csv(tmp_path):
+    path = tmp_path / "players.csv"
+    path.write_text(csv_text, encoding="utf-8")
+    return str(path)
+
+
+def test_touched_csv_is_hashed_once(tmp_path, monkeypatch):
+    path = write_csv(tmp_path)
+    columns = load_player_columns(path)
+    assert columns.names == ["A", "B"]
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+    hashed = []
+    sha256 = final_project._file_sha256
+    monkeypatch.setattr(final_project, "_file_sha256", lambda filename: hashed.append(filename) or sha256(filename))
+    assert load_player_columns(path).names == ["A", "B"]
+    assert load_player_columns(path).names == ["A", "B"]
+    assert len(hashed) == 1
+
+
+def test_snapshot_of_an_older_format_is_rebuilt(tmp_path):
+    path = write_csv(tmp_path)
+    load_player_columns(path)
+    snapshot_path = f"{path}.snapshot.npz"
+    with np.load(snapshot_path) as snapshot:
+        arrays = dict(snapshot)
+    arrays["format"] = np.array(final_project.snapshot_format - 1)
+    with open(snapshot_path, "wb") as f:
+        np.savez(f, **arrays)
+    assert load_snapshot(snapshot_path, path) is None
+    assert load_player_columns(path).names == ["A", "B"]
+    assert load_snapshot(snapshot_path, path) is not None
@@ -0,0 +1,68 @@
+import pytest
+
+from final_project import Player, RankingSystem, load_player_columns
+
+
+def make_player(name, stats):
+    return Player(name, "BOS", "PG", 25, 60, 30.0, stats)
+
+
+@pytest.fixture
+def ranking_system():
+    ranking_system = RankingSystem(min_games_played=0, min_minutes_played=0)
+    ranking_system.add_player(make_player("Full", {"PTS": 20.0, "AST": 5.0}))
+    ranking_system.add_player(make_player("Partial", {"PTS": 10.0}))
+    return ranking_system
+
+
+def test_missing_stat_raises_key_error(ranking_system):
+    partial = ranking_system.players[1]
+    with pytest.raises(KeyError):
+        partial.stats["AST"]
+    with pytest.raises(KeyError):
+        partial.stats["BLK"]
+    assert partial.stats.get("AST") is None
+    assert "AST" not in partial.stats
+
+
+def test_missing_stats_are_not_iterated(ranking_system):
+    full, partial = ranking_system.players
+    assert dict(partial.stats) == {"PTS": 10.0}
+    assert len(partial.stats) == 1
+    assert dict(full.stats) == {"PTS": 20.0, "AST": 5.0}
+
+
+def test_new_column_is_missing_for_existing_players(ranking_system):
+    ranking_system.add_player(make_player("Blocker", {"PTS": 15.0, "BLK": 2.0}))
+    full = ranking_system.players[0]
+    assert "BLK" not in full.stats
+    assert "BLK" not in full.norm_stats
+
+
+def test_set_stat_clears_missing(ranking_system):
+    partial = ranking_system.players[1]
+    partial.set_stat("AST", 7.0)
+    assert partial.stats["AST"] == 7.0
+    assert partial.norm_stats["AST"] == 1.0
+
+
+def test_norm_stats_of_new_player_are_fresh(ranking_system):
+    ranking_system.calculate_min_max()
+    ranking_system.add_player(make_player("Scorer", {"PTS": 40.0, "AST": 0.0}))
+    full, partial, scorer = ranking_system.players
+    # no explicit calculate_min_max: reading norm_stats brings the norm up to date
+    assert scorer.norm_stats["PTS"] == 1.0
+    assert full.norm_stats["PTS"] == pytest.approx(1 / 3)
+    assert partial.norm_stats["PTS"] == 0.0
+
+
+def test_bulk_loaded_players_have_no_missing_stats(tmp_path):
+    csv_file = tmp_path / "players.csv"
+    csv_file.write_text("Player,Team,Pos,Age,G,MP,PTS,AST\n"
+                        "A,BOS,PG,25,60,30,20,5\n"
+                        "B,LAL,SF,30,70,35,25,7\n")
+    ranking_system = RankingSystem(min_games_played=0, min_minutes_played=0)
+    ranking_system.add_columns(load_player_columns(str(csv_file), use_cache=False))
+    assert ranking_system.matrix._missing is None
+    assert [dict(p.stats) for p in ranking_system.players] == [{"PTS": 20.0, "AST": 5.0},
+                                                               {"PTS": 25.0, "AST": 7.0}]
@@ -0,0 +1,17 @@
+import numpy as np
+import pytest
+
+from final_project import sample_weight_vectors
+
+
+@pytest.mark.parametrize("spread", [0.1, np.float64(0.1), np.float32(0.1), (-0.1, 0.1), np.array([-0.1, 0.1])])
+def test_spread_accepts_numpy_values(spread):
+    stat_names, weight_matrix = sample_weight_vectors({"PTS": 0.5, "AST": 0.5}, {"PTS": spread}, 200, seed=1)
+    assert stat_names == ["PTS", "AST"] and weight_matrix.shape == (2, 200)
+    assert np.all(np.abs(weight_matrix[0] - 0.5) <= 0.1 + 1e-6)
+    assert np.all(weight_matrix[1] == 0.5)
+
+
+def test_backwards_range_is_rejected():
+    with pytest.raises(ValueError):
+        sample_weight_vectors({"PTS": 0.5}, {"PTS": (0.1, -0.1)})